@@ -0,0 +1,306 @@
+"""Headless micro-benchmarks for the engine's hot paths.
+
+Every scenario builds the same world from a fixed random seed, so results
+can be compared across commits:
+
+    python benchmark.py --output before.json
+    python benchmark.py --output after.json --compare before.json
+
+Results are written as JSON, with per-call timings in milliseconds.
+"""
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import typing as t
+
+import numpy as np
+import pygame
+
+import eclipse
+
+screen_size = (600, 350)
+
+def create_world() -> t.Tuple[eclipse.Engine, eclipse.World]:
+    """Creates an engine and a world with rolling terrain
+    spanning 8x4 chunks, from a fixed seed.
+    """
+    engine = eclipse.Engine()
+    world = engine.create_new_world("world")
+    spritesheet = eclipse.Spritesheet("./assets/tiles.png")
+    engine.tile_registry.register_tile(
+        eclipse.TileRegistryEntry(
+            identifier="test",
+            surface=spritesheet.get(pygame.Rect((0, 0), (16, 16)))))
+    engine.tile_registry.register_tile(
+        eclipse.TileRegistryEntry(
+            identifier="test2",
+            surface=spritesheet.get(pygame.Rect((16, 0), (16, 16)))))
+    rng = random.Random(0)
+    tiles = []
+    for x in range(-64, 64):
+        height = 8+int(6*np.sin(x/9))+rng.randint(0, 2)
+        for y in range(height, 64):
+            tiles.append((x, y, "test" if y-height < 3 else "test2"))
+        # Scatter some floating blocks above the ground
+        if rng.random() < 0.2:
+            tiles.append((x, rng.randint(-20, height-4), "test"))
+    world.set_tiles(tiles)
+    return engine, world
+
+def random_points(rng:random.Random, amount:int) -> t.List[pygame.Vector2]:
+    return [pygame.Vector2(rng.uniform(-1024, 1024), rng.uniform(-256, 768))
+            for _ in range(amount)]
+
+def spawn_particles(world:eclipse.World, amount:int):
+    rng = np.random.default_rng(0)
+    world.particles.clear()
+    world.particles.spawn_many(
+        positions=np.column_stack((rng.uniform(-300, 300, amount), rng.uniform(-200, 100, amount))),
+        velocities=rng.uniform(-80, 80, (amount, 2)),
+        lifetimes=np.full(amount, 1000.0),
+        colours=rng.integers(0, 3, (amount, 1))*60+np.array([[80, 80, 80]]),
+        radii=rng.integers(1, 4, amount))
+
+# Scenarios return a function to time, and are given a fresh world
+Scenario = t.Callable[[eclipse.Engine, eclipse.World], t.Callable[[], None]]
+scenarios:t.Dict[str, Scenario] = {}
+
+def scenario(name:str) -> t.Callable[[Scenario], Scenario]:
+    def register(function:Scenario) -> Scenario:
+        scenarios[name] = function
+        return function
+    return register
+
+@scenario("chunk.update_cached_surface")
+def bench_chunk_update_cached_surface(engine, world):
+    chunk = world.get_chunk(0, 0)
+    chunk.reset_cached_surface()
+    return chunk.update_cached_surface
+
+@scenario("chunk.set_tile")
+def bench_chunk_set_tile(engine, world):
+    chunk = world.get_chunk(0, 0)
+    # Give the chunk a surface, so every edit times a real redraw
+    chunk.surface
+    tiles = [eclipse.Tile("test"), eclipse.Tile("test2")]
+    state = {"i": 0}
+    def run():
+        i = state["i"] = state["i"]+1
+        # Swap tile type every full pass so no edit is a no-op
+        chunk.set_tile(i%16, (i//16)%16, tiles[(i//256)%2])
+    return run
+
+@scenario("world.fill_region")
+def bench_world_fill_region(engine, world):
+    identifiers = ["test", "test2"]
+    state = {"i": 0}
+    def run():
+        state["i"] += 1
+        world.fill_region(pygame.Rect(-20, -20, 40, 40), identifiers[state["i"]%2])
+    return run
+
+@scenario("world.collide_rect")
+def bench_world_collide_rect(engine, world):
+    rng = random.Random(1)
+    rects = [pygame.Rect(p.x, p.y, rng.randint(8, 32), rng.randint(8, 48))
+             for p in random_points(rng, 1000)]
+    collide_rect = world.collide_rect
+    def run():
+        for rect in rects:
+            collide_rect(rect)
+    return run
+
+@scenario("world.collide_point")
+def bench_world_collide_point(engine, world):
+    points = random_points(random.Random(2), 1000)
+    collide_point = world.collide_point
+    def run():
+        for point in points:
+            collide_point(point)
+    return run
+
+@scenario("world.collide_points")
+def bench_world_collide_points(engine, world):
+    rng = np.random.default_rng(3)
+    xs = rng.uniform(-1024, 1024, 10000)
+    ys = rng.uniform(-256, 768, 10000)
+    return lambda: world.collide_points(xs, ys)
+
+@scenario("entity.update")
+def bench_entity_update(engine, world):
+    rng = random.Random(4)
+    for _ in range(500):
+        world.spawn_entity(eclipse.Entity(
+            world=world,
+            position=pygame.Vector2(rng.uniform(-900, 900), rng.uniform(-300, 0)),
+            collider_size=pygame.Vector2(14, 30)))
+    world.update_lifecycle()
+    entities = world.entities
+    def run():
+        for entity in entities:
+            entity.update(1/60)
+    return run
+
+@scenario("world.update")
+def bench_world_update(engine, world):
+    bench_entity_update(engine, world)
+    spawn_particles(world, 5000)
+    return lambda: world.update(1/60)
+
+@scenario("particles.update")
+def bench_particles_update(engine, world):
+    spawn_particles(world, 20000)
+    return lambda: world.particles.update(1/60)
+
+@scenario("particles.draw")
+def bench_particles_draw(engine, world):
+    spawn_particles(world, 20000)
+    surface = pygame.Surface(screen_size)
+    screen_bounds = surface.get_rect()
+    camera_position = pygame.Vector2(-screen_size[0]/2, -screen_size[1]/2)
+    return lambda: world.draw_particles(surface, camera_position, screen_bounds)
+
+def bench_draw_chunks(camera_position:pygame.Vector2,
+                      display_scale:float=1.0) -> Scenario:
+    def setup(engine, world):
+        surface = pygame.Surface(screen_size)
+        screen_bounds = surface.get_rect()
+        return lambda: world.draw_chunks(surface, screen_bounds, camera_position, display_scale)
+    return setup
+
+# Camera positions inside a chunk, straddling chunk corners, and over empty space
+for name, camera_position in {
+        "origin": pygame.Vector2(0, 0),
+        "corner": pygame.Vector2(-300.5, -175.5),
+        "ground": pygame.Vector2(-128, 300),
+        "empty": pygame.Vector2(0, -2000)}.items():
+    scenario(f"world.draw_chunks[{name}]")(bench_draw_chunks(camera_position))
+# The whole world zoomed out, drawn from chunk mipmaps
+scenario("world.draw_chunks[zoom 1/4]")(bench_draw_chunks(pygame.Vector2(-1200, -700), 0.25))
+
+def bench_scroll(use_chunk_layer:bool) -> Scenario:
+    def setup(engine, world):
+        surface = pygame.Surface(screen_size)
+        screen_bounds = surface.get_rect()
+        camera_position = pygame.Vector2(-300, 100)
+        chunk_layer = eclipse.ChunkLayer(world, (30, 30, 30))
+        state = {"i": 0}
+        def run():
+            # Pan back and forth over the ground, 2 pixels per frame
+            i = state["i"] = state["i"]+1
+            camera_position.x = -300+2*abs(i%512-256)
+            if use_chunk_layer:
+                chunk_layer.draw(surface, screen_bounds, camera_position)
+            else:
+                surface.fill((30, 30, 30))
+                world.draw_chunks(surface, screen_bounds, camera_position)
+        return run
+    return setup
+
+scenario("world.draw_chunks[scroll]")(bench_scroll(False))
+scenario("chunk_layer.draw[scroll]")(bench_scroll(True))
+
+def measure(function:t.Callable[[], None],
+            min_time:float,
+            repeats:int) -> t.Dict[str, float]:
+    """Times a function, calibrating the number of calls per repeat
+    so that each repeat takes at least min_time seconds.
+
+    Returns:
+        Dict[str, float]: Per-call timings in milliseconds.
+    """
+    function()
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        elapsed = time.perf_counter()-start
+        if elapsed >= min_time:
+            break
+        number *= 2
+    timings = [elapsed/number]
+    for _ in range(repeats-1):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        timings.append((time.perf_counter()-start)/number)
+    return {
+        "min_ms": min(timings)*1000,
+        "median_ms": statistics.median(timings)*1000,
+        "mean_ms": statistics.fmean(timings)*1000,
+        "calls_per_repeat": number,
+        "repeats": repeats}
+
+def get_commit() -> t.Union[str, None]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results:t.Dict[str, t.Any], baseline:t.Dict[str, t.Any]):
+    """Prints each scenario's median time against a baseline run.
+    """
+    print(f"{'scenario':<34}{'baseline':>12}{'current':>12}{'change':>10}", file=sys.stderr)
+    for name, result in results["results"].items():
+        old = baseline["results"].get(name)
+        if old is None:
+            print(f"{name:<34}{'-':>12}{result['median_ms']:>10.4f}ms{'new':>10}", file=sys.stderr)
+            continue
+        change = result["median_ms"]/old["median_ms"]-1
+        print(f"{name:<34}{old['median_ms']:>10.4f}ms{result['median_ms']:>10.4f}ms{change:>+10.1%}", file=sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="File to write the JSON results to, instead of stdout.")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against.")
+    parser.add_argument("--filter", default="", help="Only run scenarios containing this text.")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.1,
+                        help="Minimum seconds per repeat.")
+    args = parser.parse_args()
+
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+
+    results = {
+        "meta": {
+            "commit": get_commit(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "numpy": np.__version__,
+            "platform": platform.platform()},
+        "results": {}}
+    for name, setup in scenarios.items():
+        if args.filter not in name:
+            continue
+        engine, world = create_world()
+        results["results"][name] = measure(setup(engine, world), args.min_time, args.repeats)
+        print(f"{name:<34}{results['results'][name]['median_ms']:>10.4f}ms", file=sys.stderr)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output)
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as file:
+            compare(results, json.load(file))
+
+    pygame.quit()
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,15 @@
 from .spritesheet import Spritesheet
 from .camera import Camera
 from .particle import Particle
+from .particle_system import ParticleSystem
 from .entity import Entity
+from .spatial_hash import SpatialHash
+from .chunk_layer import ChunkLayer
+from .minimap import Minimap
 from .world import World
+from .streaming import ChunkStreamer, ChunkStore, MemoryChunkStore
+from .generation import ChunkGenerationPool
+from .region import RegionFileStore
 from .engine import Engine
+from .stats import FrameStats
 from .tile import Tile, TileRegistry, TileRegistryEntry
\ No newline at end of file
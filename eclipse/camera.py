@@ -6,11 +6,13 @@ class Camera(object):
     snap amount.
     """
     position: pygame.Vector2
+    previous_position: pygame.Vector2
     target: pygame.Vector2
     snap: float
 
     def __init__(self):
         self.position = pygame.Vector2()
+        self.previous_position = pygame.Vector2()
         self.target = pygame.Vector2()
         self.snap = 7.0
     
@@ -21,4 +23,18 @@ class Camera(object):
         Args:
             dt (float): Time delta since the last update.
         """
-        self.position += (self.target-self.position)*self.snap*dt
\ No newline at end of file
+        self.previous_position.update(self.position)
+        self.position += (self.target-self.position)*self.snap*dt
+
+    def get_interpolated_position(self, alpha:float) -> pygame.Vector2:
+        """Gets the camera position between the last two updates,
+        for rendering in between fixed simulation ticks.
+
+        Args:
+            alpha (float): 0 for the previous position, 1 for the
+            current position.
+
+        Returns:
+            pygame.Vector2: The interpolated position.
+        """
+        return self.previous_position.lerp(self.position, alpha)
\ No newline at end of file
@@ -1,64 +1,396 @@
+import math
 import typing as t
+from array import array
 import pygame
 
-from .tile import Tile, TileRegistry
+from eclipse import util
+from .tile import Tile, TileRegistry, COLLISION_NONE, COLLISION_FULL, COLLISION_CUSTOM
+
+if t.TYPE_CHECKING:
+    from .stats import FrameStats
 
 class Chunk():
     """Chunks represent a square region of tiles in an Eclipse World instance.
 
     One Chunk is 16x16 tiles.
 
-    Chunks store their own cached surface image, which is updated through
-    the chunk.update_cached_surface() method, which is called after running
-    chunk.set_tile()
+    Tiles are stored as numeric tile ids (see TileRegistry.get_tile_id) in a
+    flat 16x16 array, where id 0 is empty space.
+
+    Chunks store their own cached surface image, which is only created the
+    first time chunk.surface is used, and can be dropped again with
+    chunk.release_surface() to be rebuilt from the tiles on demand. Copies
+    of the surface scaled to a display scale are cached alongside it (see
+    get_scaled_surface), until the surface is next redrawn. Scales of 1/2
+    and below are drawn from mipmaps at 1/2, 1/4 and 1/8 scale, which are
+    built from the tiles (see get_mip_surface), so zoomed out views never
+    need full size surfaces.
+
+    Running chunk.set_tile() marks the tile as dirty, and only dirty tiles
+    are redrawn through chunk.redraw_dirty_tiles(). By default this happens
+    straight away, but when chunk.defer_redraw is set the edits pile up
+    until the dirty tiles are redrawn, which World.draw_chunks() does
+    before drawing the chunk. Deferred chunks with a rebuild_queue add
+    themselves to it when they become dirty, so their world can redraw
+    them ahead of time. Headless chunks never create a surface, and skip
+    redrawing entirely.
+
+    Chunks also keep a collision grid alongside the tiles. collision_types
+    holds the collision type of every tile, and solid_rows/custom_rows hold
+    one 16 bit mask per row of the tiles that are full solids/custom shapes,
+    so most collision queries are answered with bit tests.
     """
-    tiles: t.Dict[str, Tile]
-    surface: pygame.Surface
+    tile_ids: array
+    collision_types: bytearray
+    solid_rows: t.List[int]
+    custom_rows: t.List[int]
+    _surface: t.Union[pygame.Surface, None]
+    scaled_surfaces: t.Dict[float, pygame.Surface]
+    mip_surfaces: t.Dict[int, pygame.Surface]
+    # Incremented every time the surface's contents change
+    version: int
+    # Incremented every time the tiles change
+    tiles_version: int
     tile_registry: TileRegistry
+    dirty_tiles: t.Set[int]
+    defer_redraw: bool = False
+    # Deferred chunks add themselves here when they need redrawing
+    rebuild_queue: t.Union[t.Dict["Chunk", None], None] = None
+    headless: bool
+    # Stats of the world this chunk belongs to, for counting redraws
+    stats: t.Union["FrameStats", None] = None
+    # When the chunk was last drawn by its world, in seconds
+    last_drawn: float = 0.0
 
-    def __init__(self, tile_registry:TileRegistry):
-        self.tiles = {}
-        self.reset_cached_surface()
+    # Past this many dirty tiles a full rebuild is cheaper than
+    # clearing and blitting every dirty tile one by one
+    full_redraw_threshold: int = 96
+
+    # Number of mip levels, each half the size of the last
+    mip_levels: int = 3
+
+    def __init__(self, tile_registry:TileRegistry, headless:bool=False):
+        self.tile_ids = array("H", bytes(16*16*2))
+        self.collision_types = bytearray(16*16)
+        self.solid_rows = [0]*16
+        self.custom_rows = [0]*16
+        self.dirty_tiles = set()
+        self.headless = headless
+        self._surface = None
+        self.scaled_surfaces = {}
+        self.mip_surfaces = {}
+        self.version = 0
+        self.tiles_version = 0
         self.tile_registry = tile_registry
-    
+
+    @property
+    def surface(self) -> t.Union[pygame.Surface, None]:
+        """The chunk's cached surface, which is created and drawn the
+        first time it's used. Always None for headless chunks.
+        """
+        if self._surface is None and not self.headless:
+            self.reset_cached_surface()
+            self.update_cached_surface()
+        return self._surface
+
+    def get_scaled_surface(self, scale:float) -> t.Union[pygame.Surface, None]:
+        """Gets the chunk's surface scaled by a display scale, so it can
+        be drawn straight to a full resolution display.
+
+        Args:
+            scale (float): The display scale.
+
+        Returns:
+            pygame.Surface | None: The scaled surface, ceil(256*scale)
+            pixels wide. None for headless chunks.
+        """
+        if scale == 1:
+            return self.surface
+        level = self.get_mip_level(scale)
+        if level > 0 and scale == 0.5**level:
+            return self.get_mip_surface(level)
+        scaled_surface = self.scaled_surfaces.get(scale)
+        if scaled_surface is None:
+            # Scale down from the closest mip level that's still larger
+            surface = self.surface if level == 0 else self.get_mip_surface(level)
+            if surface is None:
+                return None
+            size = math.ceil(16*16*scale)
+            scaled_surface = pygame.transform.scale(surface, (size, size))
+            scaled_surface.set_colorkey((0,0,0))
+            scaled_surface = util.convert_surface(scaled_surface, (0,0,0))
+            self.scaled_surfaces[scale] = scaled_surface
+        return scaled_surface
+
+    def has_scaled_surface(self, scale:float) -> bool:
+        if scale == 1:
+            return self._surface is not None
+        level = self.get_mip_level(scale)
+        if level > 0 and scale == 0.5**level:
+            return level in self.mip_surfaces
+        return scale in self.scaled_surfaces
+
+    def get_mip_level(self, scale:float) -> int:
+        """Picks the smallest mip level that's at least as large as a scale.
+
+        Args:
+            scale (float): The display scale.
+
+        Returns:
+            int: The mip level, where level n is 1/2**n scale, and
+            level 0 is the full size surface.
+        """
+        level = 0
+        while level < self.mip_levels and scale <= 0.5**(level+1):
+            level += 1
+        return level
+
+    def get_mip_surface(self, level:int) -> t.Union[pygame.Surface, None]:
+        """Gets the chunk drawn at 1/2**level scale, from the matching
+        level of the tile atlas. Built the first time it's used, and
+        rebuilt after the tiles change.
+
+        Args:
+            level (int): The mip level, from 1 to mip_levels.
+
+        Returns:
+            pygame.Surface | None: The mip surface. None for headless chunks.
+        """
+        if self.headless:
+            return None
+        mip_surface = self.mip_surfaces.get(level)
+        if mip_surface is None:
+            if self.stats is not None and self.stats.enabled:
+                self.stats.count("chunk_mip_builds")
+            cell_size = 16>>level
+            mip_surface = pygame.Surface((16*cell_size, 16*cell_size))
+            mip_surface.fill((0,0,0))
+            atlas, atlas_areas = self.tile_registry.get_atlas(level)
+            mip_surface.blits([
+                (atlas, ((index%16)*cell_size, (index//16)*cell_size), atlas_areas[tile_id])
+                for index, tile_id in enumerate(self.tile_ids) if tile_id != 0],
+                doreturn=False)
+            mip_surface.set_colorkey((0,0,0))
+            mip_surface = util.convert_surface(mip_surface, (0,0,0))
+            self.mip_surfaces[level] = mip_surface
+        return mip_surface
+
+    def _on_tiles_changed(self):
+        self.tiles_version += 1
+        if not self.mip_surfaces:
+            return
+        self.mip_surfaces.clear()
+        for scale in [scale for scale in self.scaled_surfaces if scale <= 0.5]:
+            del self.scaled_surfaces[scale]
+        self.version += 1
+
+    @property
+    def has_surface(self) -> bool:
+        return self._surface is not None
+
+    def is_empty(self) -> bool:
+        return not any(self.tile_ids)
+
+    def get_surface_memory(self) -> int:
+        """Gets the memory held by the chunk's cached surface.
+
+        Returns:
+            int: The size of the surface's pixels in bytes,
+            or 0 if the chunk has no surface.
+        """
+        surfaces = [*self.scaled_surfaces.values(), *self.mip_surfaces.values()]
+        if self._surface is not None:
+            surfaces.append(self._surface)
+        memory = 0
+        for surface in surfaces:
+            width, height = surface.get_size()
+            memory += width*height*surface.get_bytesize()
+        return memory
+
     def reset_cached_surface(self):
-        self.surface = pygame.Surface((16*16, 16*16))
-        self.surface.fill((0,0,0))
-        self.surface.set_colorkey((0,0,0))
+        if self.headless:
+            return
+        if self._surface is None and self.stats is not None and self.stats.enabled:
+            self.stats.count("chunk_surface_allocations")
+        surface = pygame.Surface((16*16, 16*16))
+        surface.fill((0,0,0))
+        surface.set_colorkey((0,0,0))
+        # RLE colorkey surfaces take a few hundred microseconds to encode
+        # after each edit, but draw several times faster every frame
+        self._surface = util.convert_surface(surface, (0,0,0))
+        self.version += 1
+
+    def release_surface(self):
+        """Drops the chunk's cached surfaces to free their memory. They're
+        rebuilt from the tiles the next time they're used.
+        """
+        if self._surface is None and not self.mip_surfaces:
+            return
+        if self.stats is not None and self.stats.enabled:
+            self.stats.count("chunk_surface_releases")
+        self._surface = None
+        self.scaled_surfaces.clear()
+        self.mip_surfaces.clear()
+        self.dirty_tiles.clear()
+        if self.rebuild_queue is not None:
+            self.rebuild_queue.pop(self, None)
     
     def update_cached_surface(self):
-        """Updates the chunk's cached surface.
+        """Rebuilds the chunk's whole cached surface.
         """
-        self.surface.fill((0,0,0))
-        for y in range(16):
-            for x in range(16):
-                tile = self.get_tile(x, y)
-                if tile is None: continue
-                pixel_x = x*16
-                pixel_y = y*16
-                tile_registry_entry = self.tile_registry.get_tile_registry_entry(tile.identifier)
-                self.surface.blit(tile_registry_entry.surface, (pixel_x, pixel_y))
+        self.dirty_tiles.clear()
+        surface = self._surface
+        if surface is None:
+            return
+        if self.stats is not None and self.stats.enabled:
+            self.stats.count("chunk_surface_rebuilds")
+        self.scaled_surfaces.clear()
+        self.version += 1
+        surface.fill((0,0,0))
+        # Copy every tile from the atlas in a single call
+        atlas, atlas_areas = self.tile_registry.get_atlas()
+        surface.blits([
+            (atlas, ((index%16)*16, (index//16)*16), atlas_areas[tile_id])
+            for index, tile_id in enumerate(self.tile_ids) if tile_id != 0],
+            doreturn=False)
     
-    def get_tile_key(self, x:int, y:int) -> str:
-        """Convert an x, y coordinate into a string
-        key used in the hashmap for tile access.
+    def redraw_dirty_tiles(self):
+        """Redraws only the tiles that changed since the
+        cached surface was last updated.
+        """
+        if (len(self.dirty_tiles) >= self.full_redraw_threshold
+                or self._surface is None):
+            self.update_cached_surface()
+            return
+        if self.stats is not None and self.stats.enabled:
+            self.stats.count("chunk_tile_redraws", len(self.dirty_tiles))
+        surface = self._surface
+        self.scaled_surfaces.clear()
+        self.version += 1
+        atlas, atlas_areas = self.tile_registry.get_atlas()
+        for index in self.dirty_tiles:
+            pixel_x = (index%16)*16
+            pixel_y = (index//16)*16
+            tile_id = self.tile_ids[index]
+            # Atlas cells are opaque, so they overwrite the old tile
+            if tile_id == 0:
+                surface.fill((0,0,0), (pixel_x, pixel_y, 16, 16))
+            else:
+                surface.blit(atlas, (pixel_x, pixel_y), atlas_areas[tile_id])
+        self.dirty_tiles.clear()
+    
+    def update_collision_grid(self):
+        """Rebuilds the whole collision grid from the tile ids. Only
+        needed if a registered tile's collision rects changed after
+        it was placed.
+        """
+        self.solid_rows = [0]*16
+        self.custom_rows = [0]*16
+        for index, tile_id in enumerate(self.tile_ids):
+            self._update_tile_collision(index, tile_id)
+
+    def _update_tile_collision(self, index:int, tile_id:int):
+        collision_type = COLLISION_NONE
+        if tile_id != 0:
+            collision_type = self.tile_registry.entries[tile_id].get_collision_type()
+        self.collision_types[index] = collision_type
+        y = index//16
+        bit = 1<<(index%16)
+        if collision_type == COLLISION_FULL:
+            self.solid_rows[y] |= bit
+        else:
+            self.solid_rows[y] &= ~bit
+        if collision_type == COLLISION_CUSTOM:
+            self.custom_rows[y] |= bit
+        else:
+            self.custom_rows[y] &= ~bit
+    
+    def get_tile_index(self, x:int, y:int) -> int:
+        """Convert an x, y coordinate into an index
+        into the chunk's tile array.
 
         Args:
             x (int): X coordinate of the tile in the chunk.
             y (int): Y coordinate of the tile in the chunk.
 
         Returns:
-            str: The hashmap key for this tile.
+            int: The array index for this tile.
+        """
+        return y*16+x
+
+    def get_tile_id(self, x:int, y:int) -> int:
+        return self.tile_ids[y*16+x]
+
+    def set_tile_id(self, x:int, y:int, tile_id:int):
+        index = y*16+x
+        if self.tile_ids[index] == tile_id:
+            return
+        self.tile_ids[index] = tile_id
+        self._update_tile_collision(index, tile_id)
+        self._on_tiles_changed()
+        # Chunks without a surface are drawn from scratch once they get one
+        if self._surface is None:
+            return
+        self.dirty_tiles.add(index)
+        self._queue_redraw()
+
+    def _queue_redraw(self):
+        if not self.defer_redraw:
+            self.redraw_dirty_tiles()
+        elif self.rebuild_queue is not None:
+            self.rebuild_queue[self] = None
+
+    def set_tile_ids(self, tiles:t.Iterable[t.Tuple[int, int, int]]):
+        """Sets many tile ids at once, redrawing the cached
+        surface a single time afterwards.
+
+        Args:
+            tiles (Iterable[Tuple[int, int, int]]): (x, y, tile_id)
+            entries, in chunk tile coordinates.
+        """
+        tile_ids = self.tile_ids
+        dirty_tiles = self.dirty_tiles
+        track_dirty_tiles = self._surface is not None
+        changed = False
+        for x, y, tile_id in tiles:
+            index = y*16+x
+            if tile_ids[index] == tile_id: continue
+            tile_ids[index] = tile_id
+            self._update_tile_collision(index, tile_id)
+            changed = True
+            if track_dirty_tiles:
+                dirty_tiles.add(index)
+        if changed:
+            self._on_tiles_changed()
+        if dirty_tiles:
+            self._queue_redraw()
+
+    def load_tile_ids(self, tile_ids:array):
+        """Replaces every tile in the chunk at once, such as when
+        loading the chunk, then rebuilds the collision grid and surface.
+
+        Args:
+            tile_ids (Sequence[int]): 16x16 tile ids, in the same
+            layout as chunk.tile_ids.
         """
-        return f"c{x},{y}"
+        self.tile_ids = array("H", tile_ids)
+        self.update_collision_grid()
+        self._on_tiles_changed()
+        if self._surface is None:
+            return
+        self.dirty_tiles.update(range(16*16))
+        self._queue_redraw()
 
     def get_tile(self, x:int, y:int) -> t.Union[Tile, None]:
-        key = self.get_tile_key(x, y)
-        return self.tiles.get(key)
+        tile_id = self.tile_ids[y*16+x]
+        if tile_id == 0:
+            return None
+        return self.tile_registry.entries[tile_id].tile
     
-    def set_tile(self, x:int, y:int, tile:Tile):
-        self.tiles[self.get_tile_key(x, y)] = tile
-        self.update_cached_surface()
+    def set_tile(self, x:int, y:int, tile:t.Union[Tile, None]):
+        self.set_tile_id(
+            x, y,
+            self.tile_registry.get_tile_id(None if tile is None else tile.identifier))
     
     def chunk_location_to_tile_location(self, x:float, y:float):
         return (int(x//16), int(y//16))
@@ -74,10 +406,11 @@ class Chunk():
             bool: Whether the point collided.
         """
         tile_x, tile_y = self.chunk_location_to_tile_location(point.x, point.y)
-        tile = self.get_tile(tile_x, tile_y)
-        if tile is None:
-            return False
-        tile_registry_entry = self.tile_registry.get_tile_registry_entry(tile.identifier)
+        index = tile_y*16+tile_x
+        collision_type = self.collision_types[index]
+        if collision_type != COLLISION_CUSTOM:
+            return collision_type == COLLISION_FULL
+        tile_registry_entry = self.tile_registry.entries[self.tile_ids[index]]
         # Convert the point to tile-space and check
         # whether it collides in the tile
         point_tilespace = pygame.Vector2(
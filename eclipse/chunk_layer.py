@@ -0,0 +1,145 @@
+import typing as t
+
+import pygame
+
+from eclipse import util
+from .chunk import Chunk
+
+if t.TYPE_CHECKING:
+    from .world import World
+
+type_chunk_key = t.Tuple[int, int]
+
+class ChunkLayer(object):
+    """A persistent background layer holding a world's drawn chunks,
+    which is reused from frame to frame instead of redrawing every
+    visible chunk.
+
+    When the camera moves, the layer is shifted with Surface.scroll() by
+    the whole pixels it moved, and only the newly exposed strips are
+    drawn. Chunks that were redrawn, added or removed since the last
+    frame are drawn again over their own area. Entities and particles
+    are then drawn on top of the layer as usual.
+
+    The layer is opaque, so it's filled with `background` wherever there
+    are no tiles. Chunk positions only move by whole pixels when
+    256*display_scale is a whole number, such as at integer scales.
+    """
+    world:"World"
+    background:t.Tuple[int, int, int]
+    surface:t.Union[pygame.Surface, None]
+    chunk_versions:t.Dict[type_chunk_key, t.Tuple[Chunk, int]]
+    _origin:t.Tuple[int, int]
+    _display_scale:float
+
+    def __init__(self,
+                 world:"World",
+                 background:t.Tuple[int, int, int]=(0, 0, 0)):
+        self.world = world
+        self.background = background
+        self.surface = None
+        # The chunk and chunk version drawn at each location
+        self.chunk_versions = {}
+        self._origin = (0, 0)
+        self._display_scale = 1.0
+
+    def invalidate(self):
+        """Makes the next draw redraw the whole layer.
+        """
+        self.surface = None
+        self.chunk_versions.clear()
+
+    def draw(self,
+             surface:pygame.Surface,
+             screen_bounds:pygame.Rect,
+             camera_position:pygame.Vector2,
+             display_scale:float=1.0):
+        """Brings the layer up to date, and draws it to the screen bounds.
+
+        Args:
+            surface (pygame.Surface): Surface to draw to.
+            screen_bounds (pygame.Rect): Area of the surface to draw to.
+            camera_position (pygame.Vector2): The camera position.
+            display_scale (float, optional): Pixels per world unit.
+            Defaults to 1.0.
+        """
+        world = self.world
+        if world.headless:
+            return
+        layer_rect = pygame.Rect((0, 0), screen_bounds.size)
+        # Chunks are drawn at the same surface positions as draw_chunks(),
+        # and the layer covers the screen bounds, so layer positions are
+        # offset by the screen bounds' corner
+        offset_x, offset_y = screen_bounds.topleft
+        def get_layer_position(x:int, y:int) -> t.Tuple[int, int]:
+            screen_x, screen_y = world.get_chunk_screen_position(
+                x, y, camera_position, display_scale)
+            return (screen_x-offset_x, screen_y-offset_y)
+        # The pixel offset of the world origin on the layer
+        origin = get_layer_position(0, 0)
+        exposed_rects = []
+        if (self.surface is None
+                or self.surface.get_size() != layer_rect.size
+                or display_scale != self._display_scale):
+            self.surface = util.convert_surface(pygame.Surface(layer_rect.size))
+            self.chunk_versions.clear()
+            exposed_rects.append(layer_rect)
+        else:
+            dx = origin[0]-self._origin[0]
+            dy = origin[1]-self._origin[1]
+            if abs(dx) >= layer_rect.width or abs(dy) >= layer_rect.height:
+                exposed_rects.append(layer_rect)
+            elif dx or dy:
+                self.surface.scroll(dx, dy)
+                if dx > 0:
+                    exposed_rects.append(pygame.Rect(0, 0, dx, layer_rect.height))
+                elif dx < 0:
+                    exposed_rects.append(pygame.Rect(layer_rect.width+dx, 0, -dx, layer_rect.height))
+                if dy > 0:
+                    exposed_rects.append(pygame.Rect(0, 0, layer_rect.width, dy))
+                elif dy < 0:
+                    exposed_rects.append(pygame.Rect(0, layer_rect.height+dy, layer_rect.width, -dy))
+        self._origin = origin
+        self._display_scale = display_scale
+
+        layer = self.surface
+        background = self.background
+        chunk_size = -int(-256*display_scale//1)
+        chunk_versions = self.chunk_versions
+        visible_chunks = []
+        changed_rects = []
+        # Find the visible chunks, and the chunks that changed since
+        # they were last drawn onto the layer
+        for x, y, chunk in world.iter_drawable_chunks(
+                screen_bounds, camera_position, display_scale):
+            position = get_layer_position(x, y)
+            visible_chunks.append((x, y, chunk, position))
+            drawn = chunk_versions.get((x, y))
+            if drawn is None or drawn[0] is not chunk or drawn[1] != chunk.version:
+                changed_rects.append(pygame.Rect(position, (chunk_size, chunk_size)))
+                chunk_versions[(x, y)] = (chunk, chunk.version)
+        # Clear the area of chunks that are no longer drawn
+        visible_keys = set((x, y) for x, y, _, _ in visible_chunks)
+        for key in list(chunk_versions):
+            if key not in visible_keys:
+                del chunk_versions[key]
+                changed_rects.append(pygame.Rect(
+                    get_layer_position(*key), (chunk_size, chunk_size)))
+
+        # Redraw every chunk overlapping each out of date area
+        blits = 0
+        for rect in exposed_rects+changed_rects:
+            rect = rect.clip(layer_rect)
+            if not rect:
+                continue
+            layer.set_clip(rect)
+            layer.fill(background)
+            for x, y, chunk, position in visible_chunks:
+                if rect.colliderect((position, (chunk_size, chunk_size))):
+                    layer.blit(chunk.get_scaled_surface(display_scale), position)
+                    blits += 1
+        layer.set_clip(None)
+        if world.stats.enabled:
+            world.stats.count("chunk_layer_blits", blits)
+
+        surface.blit(layer, screen_bounds.topleft)
@@ -5,22 +5,141 @@ import pygame
 from . import World
 from . import Camera
 from .tile import TileRegistry
+from .stats import FrameStats
 
 class Engine(object):
+    """The Engine holds the worlds, camera and tile registry of a game,
+    and can drive them with a fixed timestep simulation loop.
+
+    Frame time is added to an accumulator which is spent in fixed ticks
+    of 1/tick_rate seconds, so the simulation behaves the same at any
+    frame rate. The leftover fraction of a tick is kept in
+    engine.interpolation, for rendering entities and the camera in
+    between the last two ticks.
+    """
     worlds: t.Dict[str, World]
     camera: Camera
     tile_registry: TileRegistry
+    tick_rate: float
+    max_ticks_per_frame: int
+    accumulator: float
+    interpolation: float
+    running: bool
+    headless: bool
+    stats: FrameStats
 
-    def __init__(self):
+    def __init__(self,
+                 tick_rate:float=60.0,
+                 max_ticks_per_frame:int=5,
+                 headless:bool=False):
         self.worlds = {}
         self.camera = Camera()
         self.tile_registry = TileRegistry()
+
+        # Fixed timestep properties
+        self.tick_rate = tick_rate
+        self.max_ticks_per_frame = max_ticks_per_frame
+        self.accumulator = 0.0
+        self.interpolation = 1.0
+        self.running = False
+
+        # Headless engines create headless worlds, which never allocate
+        # or draw surfaces and don't need a display
+        self.headless = headless
+
+        # Per-frame profiling stats, shared by every world
+        self.stats = FrameStats()
     
     def create_new_world(self, name:str) -> World:
-        w = World(self.tile_registry)
+        w = World(self.tile_registry, self.headless, self.stats)
         self.worlds[name] = w
         return w
 
+    def tick(self, dt:float):
+        """Runs a single simulation tick of the camera and every world.
+
+        Args:
+            dt (float): The tick length.
+        """
+        self.camera.update(dt)
+        for world in self.worlds.values():
+            world.update(dt)
+
+    def step(self,
+             frame_dt:float,
+             fixed_update:t.Union[t.Callable[[float], None], None]=None) -> int:
+        """Advances the simulation by a frame's worth of time, in as many
+        fixed ticks as fit, and updates engine.interpolation.
+
+        If more than max_ticks_per_frame ticks are due, the extra time is
+        dropped so a slow frame can't snowball into ever slower frames.
+
+        Args:
+            frame_dt (float): Time since the last frame.
+            fixed_update (Callable[[float], None], optional): Game logic
+            to run before each tick, given the tick length. Defaults to None.
+
+        Returns:
+            int: The number of ticks that ran.
+        """
+        tick_dt = 1/self.tick_rate
+        if self.stats.enabled:
+            self.stats.set("frame_time", frame_dt*1000)
+        self.accumulator += frame_dt
+        ticks = 0
+        while self.accumulator >= tick_dt:
+            if ticks >= self.max_ticks_per_frame:
+                self.accumulator %= tick_dt
+                break
+            if fixed_update is not None:
+                fixed_update(tick_dt)
+            self.tick(tick_dt)
+            self.accumulator -= tick_dt
+            ticks += 1
+        self.interpolation = self.accumulator/tick_dt
+        if self.stats.enabled:
+            self.stats.set("ticks", ticks)
+        return ticks
+
+    def get_render_camera_position(self) -> pygame.Vector2:
+        """Gets the camera position to render with this frame.
+
+        Returns:
+            pygame.Vector2: The interpolated camera position.
+        """
+        return self.camera.get_interpolated_position(self.interpolation)
+
+    def run(self,
+            fixed_update:t.Callable[[float], None],
+            render:t.Callable[[float], None],
+            frame_update:t.Union[t.Callable[[float], None], None]=None,
+            max_frame_rate:int=0):
+        """Runs the main loop until engine.running is set to False.
+
+        Each frame calls frame_update with the frame time (for handling
+        events and input), steps the simulation with fixed_update running
+        before every tick, then calls render with engine.interpolation.
+
+        Args:
+            fixed_update (Callable[[float], None]): Game logic per tick.
+            render (Callable[[float], None]): Rendering per frame.
+            frame_update (Callable[[float], None], optional): Logic run
+            once per frame. Defaults to None.
+            max_frame_rate (int, optional): Frame rate cap, or 0 for
+            uncapped. Defaults to 0.
+        """
+        clock = pygame.time.Clock()
+        self.running = True
+        while self.running:
+            frame_dt = clock.tick(max_frame_rate)/1000
+            if frame_update is not None:
+                frame_update(frame_dt)
+            if not self.running:
+                break
+            self.step(frame_dt, fixed_update)
+            render(self.interpolation)
+            self.stats.end_frame()
+
     def screen_space_to_world_space(self,
                                     point:pygame.Vector2,
                                     display_scale:float=1.0) -> pygame.Vector2:
@@ -13,6 +13,8 @@ slipperiness_default=0.5
 class Entity(object):
     world:"World"
     collider_rect: pygame.Rect
+    position: pygame.Vector2
+    previous_position: pygame.Vector2
     velocity: pygame.Vector2
     gravity:pygame.Vector2
     drag:float
@@ -52,6 +54,7 @@ class Entity(object):
         
         self.velocity = pygame.Vector2(0,0)
         self.position = self.get_rect_position()
+        self.previous_position = self.position.copy()
         
         # Physics properties
         self.gravity = gravity
@@ -72,6 +75,19 @@ class Entity(object):
             self.collider_rect.centerx,
             self.collider_rect.bottom)
     
+    def get_interpolated_position(self, alpha:float) -> pygame.Vector2:
+        """Gets the entity position between the last two updates,
+        for rendering in between fixed simulation ticks.
+
+        Args:
+            alpha (float): 0 for the previous position, 1 for the
+            current position.
+
+        Returns:
+            pygame.Vector2: The interpolated position.
+        """
+        return self.previous_position.lerp(self.position, alpha)
+    
     def apply_impulse(self, impulse:pygame.Vector2):
         self.velocity += impulse
     
@@ -139,6 +155,7 @@ class Entity(object):
             dt=dt)
     
     def update(self, dt:float):
+        self.previous_position.update(self.position)
         self.is_grounded = False
 
         self.position.x += self.velocity.x*dt
@@ -216,17 +233,18 @@ class Entity(object):
 
     def draw(self,
              surface:pygame.Surface,
-             camera_position:pygame.Vector2) -> None:
+             camera_position:pygame.Vector2,
+             display_scale:float=1.0) -> None:
         pygame.draw.rect(
             surface=surface,
             color=(255, 255, 255),
             rect=pygame.Rect(
-                self.collider_rect.left-camera_position.x,
-                self.collider_rect.top-camera_position.y,
-                self.collider_rect.width,
-                self.collider_rect.height
+                (self.collider_rect.left-camera_position.x)*display_scale,
+                (self.collider_rect.top-camera_position.y)*display_scale,
+                self.collider_rect.width*display_scale,
+                self.collider_rect.height*display_scale
             ),
-            width=2
+            width=max(1, round(2*display_scale))
         )
 
     # Functions intended to be overwritten by subclasses
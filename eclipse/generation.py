@@ -0,0 +1,100 @@
+import concurrent.futures
+import typing as t
+from array import array
+
+if t.TYPE_CHECKING:
+    from .world import World, ChunkGenerator
+
+type_chunk_key = t.Tuple[int, int]
+
+def _generate_chunk(generator:"ChunkGenerator",
+                    x:int,
+                    y:int) -> t.Union[bytes, None]:
+    # Runs in a worker process. Packed bytes are the cheapest to send back.
+    palette_indices = generator.generate(x, y)
+    if palette_indices is None:
+        return None
+    return array("H", palette_indices).tobytes()
+
+class ChunkGenerationPool(object):
+    """Runs a World's chunk generator in a pool of worker processes, so
+    that slow terrain generation never stalls the frame that needs it.
+
+    Chunks are requested with request_chunk(), and poll() adds the chunks
+    that finished generating to the world. Workers only return compact
+    palette indices, and chunks are built on the calling thread.
+    """
+    world:"World"
+    executor:concurrent.futures.ProcessPoolExecutor
+    pending:t.Dict[type_chunk_key, concurrent.futures.Future]
+
+    def __init__(self, world:"World", max_workers:t.Union[int, None]=None):
+        self.world = world
+        self.executor = concurrent.futures.ProcessPoolExecutor(max_workers)
+        self.pending = {}
+
+    def is_pending(self, x:int, y:int) -> bool:
+        return (x, y) in self.pending
+
+    def request_chunk(self, x:int, y:int):
+        """Starts generating a chunk in the background, unless it's
+        already loaded or being generated.
+
+        Args:
+            x (int): X location of the chunk.
+            y (int): Y location of the chunk.
+        """
+        if (x, y) in self.pending or (x, y) in self.world.chunks:
+            return
+        self.pending[(x, y)] = self.executor.submit(
+            _generate_chunk, self.world.chunk_generator, x, y)
+
+    def poll(self, max_chunks:t.Union[int, None]=None) -> int:
+        """Adds finished chunks to the world. Chunks that were loaded
+        some other way in the meantime are left as they are.
+
+        Args:
+            max_chunks (int, optional): The most chunks to add in this
+            call, to spread the work of building them over frames.
+            Defaults to None, for no limit.
+
+        Returns:
+            int: The number of chunks added.
+        """
+        world = self.world
+        added = 0
+        for key, future in list(self.pending.items()):
+            if max_chunks is not None and added >= max_chunks:
+                break
+            if not future.done():
+                continue
+            del self.pending[key]
+            if key in world.chunks:
+                continue
+            data = future.result()
+            palette_indices = None
+            if data is not None:
+                palette_indices = array("H")
+                palette_indices.frombytes(data)
+            chunk = world.chunk_generator.build_chunk(
+                palette_indices, world.tile_registry, world.headless)
+            world.add_chunk(key[0], key[1], chunk)
+            added += 1
+        return added
+
+    def cancel(self, x:int, y:int):
+        """Stops waiting on a chunk, such as one that went out of range.
+
+        Args:
+            x (int): X location of the chunk.
+            y (int): Y location of the chunk.
+        """
+        future = self.pending.pop((x, y), None)
+        if future is not None:
+            future.cancel()
+
+    def shutdown(self):
+        for future in self.pending.values():
+            future.cancel()
+        self.pending.clear()
+        self.executor.shutdown(wait=True)
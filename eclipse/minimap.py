@@ -0,0 +1,209 @@
+import collections
+import typing as t
+import weakref
+
+import numpy as np
+import pygame
+
+from .chunk import Chunk
+
+if t.TYPE_CHECKING:
+    from .world import World
+
+type_chunk_key = t.Tuple[int, int]
+
+class Minimap(object):
+    """The Minimap draws an overview of a world, centred on the camera.
+
+    Every chunk gets a thumbnail with one pixel per tile (or per square
+    of tiles_per_pixel tiles), coloured with each tile's average colour.
+    Thumbnails are cached and only rebuilt when their chunk's tiles
+    change, so drawing the minimap never scans the whole world.
+
+    Thumbnails of chunks that were unloaded are kept, so the minimap
+    still shows areas that were streamed out. They are stored as compact
+    pixel arrays instead of surfaces, and only the max_unloaded_thumbnails
+    most recently drawn are kept. Surfaces are only kept for the
+    unloaded chunks in view, so they aren't rebuilt every frame.
+    """
+    world:"World"
+    size:t.Tuple[int, int]
+    tiles_per_pixel:int
+    background:t.Tuple[int, int, int]
+    surface:pygame.Surface
+    # (chunk reference, chunk.tiles_version, registry revision, thumbnail)
+    # by location for loaded chunks. Chunks are weakly referenced, so
+    # they can be freed once unloaded.
+    thumbnails:t.Dict[type_chunk_key, t.Tuple["weakref.ref[Chunk]", int, int, pygame.Surface]]
+    # Thumbnail pixels of unloaded chunks by location, from least to
+    # most recently drawn
+    unloaded_thumbnails:t.OrderedDict[type_chunk_key, np.ndarray]
+    # Thumbnail surfaces of the unloaded chunks in view by location
+    unloaded_surfaces:t.Dict[type_chunk_key, pygame.Surface]
+    _colour_table:t.Union[np.ndarray, None]
+    _colour_table_revision:int
+
+    # Colour of tiles without a surface
+    default_tile_colour:t.Tuple[int, int, int] = (127, 127, 127)
+
+    # Most thumbnails of unloaded chunks kept, so streaming through a
+    # large world can't grow the cache without limit
+    max_unloaded_thumbnails:int = 16384
+
+    def __init__(self,
+                 world:"World",
+                 size:t.Tuple[int, int],
+                 tiles_per_pixel:int=1,
+                 background:t.Tuple[int, int, int]=(0, 0, 0)):
+        if 16%tiles_per_pixel != 0:
+            raise ValueError("tiles_per_pixel must divide 16")
+        self.world = world
+        self.size = size
+        self.tiles_per_pixel = tiles_per_pixel
+        self.background = background
+        self.surface = pygame.Surface(size)
+        self.thumbnails = {}
+        self.unloaded_thumbnails = collections.OrderedDict()
+        self.unloaded_surfaces = {}
+        self._colour_table = None
+        self._colour_table_revision = -1
+
+    def get_colour_table(self) -> np.ndarray:
+        """Gets the minimap colour of every tile id, where empty
+        space is the background colour.
+
+        Returns:
+            np.ndarray: (n, 3) uint8 colours, indexed by tile id.
+        """
+        tile_registry = self.world.tile_registry
+        if self._colour_table is None or self._colour_table_revision != tile_registry.revision:
+            colours = [self.background]
+            for tile_registry_entry in tile_registry.entries[1:]:
+                colour = tile_registry_entry.average_colour
+                colours.append(colour if colour is not None else self.default_tile_colour)
+            self._colour_table = np.array(colours, dtype=np.uint8)
+            self._colour_table_revision = tile_registry.revision
+        return self._colour_table
+
+    def get_thumbnail(self, x:int, y:int) -> t.Union[pygame.Surface, None]:
+        """Gets a chunk's thumbnail, rebuilding it if its tiles changed.
+
+        Args:
+            x (int): X location of the chunk.
+            y (int): Y location of the chunk.
+
+        Returns:
+            pygame.Surface | None: The thumbnail, or None if the chunk
+            was never loaded or its thumbnail was evicted.
+        """
+        chunk = self.world.chunks.get((x, y))
+        if chunk is None:
+            if (x, y) in self.thumbnails:
+                self.store_unloaded_thumbnail(x, y)
+            pixels = self.unloaded_thumbnails.get((x, y))
+            if pixels is None:
+                return None
+            self.unloaded_thumbnails.move_to_end((x, y))
+            surface = self.unloaded_surfaces.get((x, y))
+            if surface is None:
+                surface = self.unloaded_surfaces[(x, y)] = pygame.surfarray.make_surface(pixels)
+            return surface
+        thumbnail = self.thumbnails.get((x, y))
+        revision = self.world.tile_registry.revision
+        if (thumbnail is not None
+                and thumbnail[0]() is chunk
+                and thumbnail[1] == chunk.tiles_version
+                and thumbnail[2] == revision):
+            return thumbnail[3]
+        tile_ids = np.frombuffer(chunk.tile_ids, dtype=np.uint16).reshape(16, 16)
+        pixels = self.get_colour_table()[tile_ids]
+        tiles_per_pixel = self.tiles_per_pixel
+        if tiles_per_pixel > 1:
+            # Average each square of tiles into one pixel
+            size = 16//tiles_per_pixel
+            pixels = pixels.reshape(size, tiles_per_pixel, size, tiles_per_pixel, 3)\
+                .mean(axis=(1, 3)).astype(np.uint8)
+        # Pixels are indexed [y][x], surfarray expects [x][y]
+        surface = pygame.surfarray.make_surface(pixels.swapaxes(0, 1))
+        self.thumbnails[(x, y)] = (weakref.ref(chunk), chunk.tiles_version, revision, surface)
+        self.unloaded_thumbnails.pop((x, y), None)
+        self.unloaded_surfaces.pop((x, y), None)
+        return surface
+
+    def store_unloaded_thumbnail(self, x:int, y:int):
+        """Moves the thumbnail of an unloaded chunk into
+        unloaded_thumbnails, evicting the least recently drawn
+        unloaded thumbnails when there are too many.
+
+        Args:
+            x (int): X location of the chunk.
+            y (int): Y location of the chunk.
+        """
+        thumbnail = self.thumbnails.pop((x, y))
+        unloaded_thumbnails = self.unloaded_thumbnails
+        unloaded_thumbnails[(x, y)] = pygame.surfarray.array3d(thumbnail[3])
+        unloaded_thumbnails.move_to_end((x, y))
+        self.unloaded_surfaces[(x, y)] = thumbnail[3]
+        while len(unloaded_thumbnails) > self.max_unloaded_thumbnails:
+            key, _ = unloaded_thumbnails.popitem(last=False)
+            self.unloaded_surfaces.pop(key, None)
+
+    def store_unloaded_thumbnails(self):
+        """Moves the thumbnails of every unloaded chunk
+        into unloaded_thumbnails.
+        """
+        chunks = self.world.chunks
+        for key in [key for key in self.thumbnails if key not in chunks]:
+            self.store_unloaded_thumbnail(*key)
+
+    def draw(self,
+             surface:pygame.Surface,
+             position:t.Tuple[int, int],
+             camera_position:pygame.Vector2,
+             view_size:t.Tuple[float, float]=(0, 0)):
+        """Draws the minimap, centred on the middle of the camera's view.
+
+        Args:
+            surface (pygame.Surface): Surface to draw to.
+            position (Tuple[int, int]): Top left corner of the minimap
+            on the surface.
+            camera_position (pygame.Vector2): The camera position.
+            view_size (Tuple[float, float], optional): Size of the camera's
+            view in world units. Defaults to (0, 0), to centre the
+            minimap on the camera position.
+        """
+        # There are more thumbnail surfaces than loaded chunks
+        # once chunks were unloaded
+        if len(self.thumbnails) > len(self.world.chunks):
+            self.store_unloaded_thumbnails()
+        minimap = self.surface
+        minimap.fill(self.background)
+        width, height = self.size
+        # Minimap pixel of the world origin
+        world_units_per_pixel = 16*self.tiles_per_pixel
+        center_x = int((camera_position.x+view_size[0]/2)//world_units_per_pixel)
+        center_y = int((camera_position.y+view_size[1]/2)//world_units_per_pixel)
+        origin_x = width//2-center_x
+        origin_y = height//2-center_y
+        # Blit the thumbnail of every chunk in view
+        thumbnail_size = 16//self.tiles_per_pixel
+        chunk_min_x = -origin_x//thumbnail_size
+        chunk_min_y = -origin_y//thumbnail_size
+        chunk_max_x = (width-origin_x-1)//thumbnail_size
+        chunk_max_y = (height-origin_y-1)//thumbnail_size
+        blit_sequence = []
+        for y in range(chunk_min_y, chunk_max_y+1):
+            for x in range(chunk_min_x, chunk_max_x+1):
+                thumbnail = self.get_thumbnail(x, y)
+                if thumbnail is None:
+                    continue
+                blit_sequence.append(
+                    (thumbnail, (origin_x+x*thumbnail_size, origin_y+y*thumbnail_size)))
+        minimap.blits(blit_sequence, doreturn=False)
+        surface.blit(minimap, position)
+        # Drop the surfaces of unloaded chunks that went out of view
+        unloaded_surfaces = self.unloaded_surfaces
+        for key in [key for key in unloaded_surfaces
+                    if not (chunk_min_x <= key[0] <= chunk_max_x
+                            and chunk_min_y <= key[1] <= chunk_max_y)]:
+            del unloaded_surfaces[key]
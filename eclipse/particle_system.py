@@ -0,0 +1,315 @@
+import collections
+import typing as t
+import numpy as np
+import pygame
+
+from eclipse import util
+from .particle import Particle, type_colour, gravity_default
+
+if t.TYPE_CHECKING:
+    from .world import World
+
+class ParticleSystem(object):
+    """The ParticleSystem stores every particle in a world as rows of
+    contiguous NumPy arrays (structure-of-arrays), so that all particles
+    are integrated, aged and culled with batched array operations instead
+    of one Particle.update() call per particle. Collisions against the
+    tiles are resolved for all particles at once with World.collide_points().
+
+    Only the first `count` rows of each array hold live particles. The
+    arrays grow by doubling when they run out of capacity, and dead
+    particles are compacted out at the end of every update.
+
+    Particles are drawn from pre-rendered circle sprites, cached per
+    colour and radius, which are submitted in a single Surface.blits() call.
+    The cache keeps the max_sprites most recently used sprites.
+    """
+    world:"World"
+    count:int
+    positions:np.ndarray
+    velocities:np.ndarray
+    lifetimes:np.ndarray
+    lifetimes_max:np.ndarray
+    colours:np.ndarray
+    radii:np.ndarray
+    gravities:np.ndarray
+    drags:np.ndarray
+    restitutions:np.ndarray
+    slipperinesses:np.ndarray
+    expire_on_collision:np.ndarray
+    sprites:t.OrderedDict[int, pygame.Surface]
+
+    # Most sprites kept in the cache, so particles with many different
+    # colours can't grow it without limit
+    max_sprites:int = 4096
+
+    def __init__(self, world:"World", capacity:int=256):
+        # Important reference properties
+        self.world = world
+        self.count = 0
+        self._allocate(capacity)
+        # Sprites from least to most recently used
+        self.sprites = collections.OrderedDict()
+
+    def _allocate(self, capacity:int):
+        self.positions = np.zeros((capacity, 2), dtype=np.float64)
+        self.velocities = np.zeros((capacity, 2), dtype=np.float64)
+        self.lifetimes = np.zeros(capacity, dtype=np.float64)
+        self.lifetimes_max = np.zeros(capacity, dtype=np.float64)
+        self.colours = np.zeros((capacity, 3), dtype=np.uint8)
+        self.radii = np.zeros(capacity, dtype=np.int32)
+        self.gravities = np.zeros((capacity, 2), dtype=np.float64)
+        self.drags = np.zeros(capacity, dtype=np.float64)
+        self.restitutions = np.zeros(capacity, dtype=np.float64)
+        self.slipperinesses = np.zeros(capacity, dtype=np.float64)
+        self.expire_on_collision = np.zeros(capacity, dtype=np.bool_)
+
+    def _arrays(self) -> t.List[np.ndarray]:
+        return [self.positions, self.velocities, self.lifetimes,
+                self.lifetimes_max, self.colours, self.radii,
+                self.gravities, self.drags, self.restitutions,
+                self.slipperinesses, self.expire_on_collision]
+
+    def _reserve(self, amount:int) -> slice:
+        """Makes room for `amount` more particles, growing the
+        arrays if needed, and returns the rows to write them to.
+        """
+        capacity = len(self.lifetimes)
+        required = self.count+amount
+        if required > capacity:
+            capacity = max(capacity*2, required)
+            old_arrays = self._arrays()
+            self._allocate(capacity)
+            for old, new in zip(old_arrays, self._arrays()):
+                new[:self.count] = old[:self.count]
+        rows = slice(self.count, required)
+        self.count = required
+        return rows
+
+    def __len__(self) -> int:
+        return self.count
+
+    def clear(self):
+        self.count = 0
+
+    def spawn(self,
+              position:pygame.Vector2,
+              velocity:pygame.Vector2,
+              lifetime:float,
+              colour:type_colour,
+              radius:int,
+              gravity:pygame.Vector2=gravity_default,
+              drag:float=0.2,
+              restitution:float=0.5,
+              slipperiness:float=0.95,
+              expire_on_collision:bool=False):
+        """Spawns a single particle. Takes the same arguments as Particle.
+        """
+        row = self._reserve(1).start
+        self.positions[row] = (position.x, position.y)
+        self.velocities[row] = (velocity.x, velocity.y)
+        self.lifetimes[row] = lifetime
+        self.lifetimes_max[row] = lifetime
+        self.colours[row] = colour
+        self.radii[row] = radius
+        self.gravities[row] = (gravity.x, gravity.y)
+        self.drags[row] = drag
+        self.restitutions[row] = restitution
+        self.slipperinesses[row] = slipperiness
+        self.expire_on_collision[row] = expire_on_collision
+
+    def spawn_many(self,
+                   positions:np.ndarray,
+                   velocities:np.ndarray,
+                   lifetimes:np.ndarray,
+                   colours:np.ndarray,
+                   radii:np.ndarray,
+                   gravity:np.ndarray=(gravity_default.x, gravity_default.y),
+                   drag:np.ndarray=0.2,
+                   restitution:np.ndarray=0.5,
+                   slipperiness:np.ndarray=0.95,
+                   expire_on_collision:np.ndarray=False):
+        """Spawns a batch of particles at once, such as an explosion burst.
+
+        Every argument is either an array with one row per particle, or
+        a single value that is broadcast to the whole batch.
+
+        Args:
+            positions (np.ndarray): (n, 2) positions.
+            velocities (np.ndarray): (n, 2) velocities.
+            lifetimes (np.ndarray): (n,) lifetimes.
+            colours (np.ndarray): (n, 3) or (3,) colours.
+            radii (np.ndarray): (n,) radii.
+            gravity (np.ndarray, optional): (n, 2) or (2,) gravity.
+            drag (np.ndarray, optional): (n,) drag.
+            restitution (np.ndarray, optional): (n,) restitution.
+            slipperiness (np.ndarray, optional): (n,) slipperiness.
+            expire_on_collision (np.ndarray, optional): (n,) flags.
+        """
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        rows = self._reserve(len(positions))
+        self.positions[rows] = positions
+        self.velocities[rows] = velocities
+        self.lifetimes[rows] = lifetimes
+        self.lifetimes_max[rows] = lifetimes
+        self.colours[rows] = colours
+        self.radii[rows] = radii
+        self.gravities[rows] = gravity
+        self.drags[rows] = drag
+        self.restitutions[rows] = restitution
+        self.slipperinesses[rows] = slipperiness
+        self.expire_on_collision[rows] = expire_on_collision
+
+    def add(self, particle:Particle):
+        """Adds a Particle instance to the system. The particle's
+        values are copied in, so the instance is not kept.
+
+        Args:
+            particle (Particle): The particle to add.
+        """
+        self.spawn(
+            position=particle.position,
+            velocity=particle.velocity,
+            lifetime=particle.lifetime,
+            colour=particle.colour,
+            radius=particle.radius,
+            gravity=particle.gravity,
+            drag=particle.drag,
+            restitution=particle.restitution,
+            slipperiness=particle.slipperiness,
+            expire_on_collision=particle.expire_on_collision)
+        self.lifetimes_max[self.count-1] = particle.lifetime_max
+
+    def update(self, dt:float):
+        """Updates every particle, mirroring Particle.update(), then
+        removes the particles that died.
+
+        Args:
+            dt (float): Time delta since the last update.
+        """
+        n = self.count
+        if n == 0:
+            return
+        positions = self.positions[:n]
+        velocities = self.velocities[:n]
+        restitutions = self.restitutions[:n]
+        slipperinesses = self.slipperinesses[:n]
+        expire_on_collision = self.expire_on_collision[:n]
+
+        # Decrease lifetime by delta, and if the time
+        # is up it means the particle should die
+        lifetimes = self.lifetimes[:n]
+        lifetimes -= dt
+        alive = lifetimes > 0
+
+        # Update position and bounce off collisions, one axis at a time
+        for axis in (0, 1):
+            other_axis = 1-axis
+            step = velocities[:, axis]*dt
+            positions[:, axis] += step
+            collided = self.world.collide_points(positions[:, 0], positions[:, 1])
+            collided &= alive
+            if collided.any():
+                positions[collided, axis] -= step[collided]
+                velocities[collided, axis] *= -restitutions[collided]
+                velocities[collided, other_axis] *= slipperinesses[collided]
+                alive &= ~(collided & expire_on_collision)
+
+        # Update velocity
+        velocities += self.gravities[:n]*dt
+
+        # Apply drag
+        velocities -= velocities*(self.drags[:n]*dt)[:, None]
+
+        # Compact the surviving particles to the front of the arrays
+        if not alive.all():
+            survivors = np.flatnonzero(alive)
+            for array in self._arrays():
+                array[:len(survivors)] = array[survivors]
+            self.count = len(survivors)
+
+    def get_sprite(self, colour:type_colour, radius:int) -> pygame.Surface:
+        """Gets the cached circle sprite for a colour and radius,
+        rendering it the first time it is needed.
+
+        Args:
+            colour (type_colour): The particle colour.
+            radius (int): The particle radius.
+
+        Returns:
+            pygame.Surface: The sprite, sized (radius*2, radius*2).
+        """
+        # Sprites are keyed by colour and radius packed into one int
+        key = (int(colour[0])<<40) | (int(colour[1])<<32) | (int(colour[2])<<24) | radius
+        return self._get_cached_sprite(key)
+
+    def _get_cached_sprite(self, key:int) -> pygame.Surface:
+        sprites = self.sprites
+        sprite = sprites.get(key)
+        if sprite is None:
+            sprite = sprites[key] = self._render_sprite(key)
+            # Evict the least recently used sprite when over the limit
+            if len(sprites) > self.max_sprites:
+                sprites.popitem(last=False)
+        else:
+            sprites.move_to_end(key)
+        return sprite
+
+    def _render_sprite(self, key:int) -> pygame.Surface:
+        colour = ((key>>40)&255, (key>>32)&255, (key>>24)&255)
+        radius = key&0xFFFFFF
+        # Pick a colour key that can't clash with the particle colour
+        color_key = (255, 0, 255) if colour != (255, 0, 255) else (0, 0, 0)
+        sprite = pygame.Surface((radius*2, radius*2))
+        sprite.fill(color_key)
+        sprite.set_colorkey(color_key)
+        pygame.draw.circle(sprite, colour, (radius, radius), radius)
+        return util.convert_surface(sprite, color_key)
+
+    def draw(self,
+             surface:pygame.Surface,
+             camera_position:pygame.Vector2,
+             screen_bounds:t.Union[pygame.Rect, None]=None,
+             display_scale:float=1.0) -> None:
+        """Draws every particle that overlaps the screen bounds.
+
+        Args:
+            surface (pygame.Surface): Surface to draw to.
+            camera_position (pygame.Vector2): The camera position.
+            screen_bounds (pygame.Rect, optional): Area of the surface
+            to draw to. Defaults to the whole surface.
+            display_scale (float, optional): Pixels per world unit.
+            Defaults to 1.0.
+        """
+        n = self.count
+        if n == 0:
+            return
+        if screen_bounds is None:
+            screen_bounds = surface.get_rect()
+        radii = self.radii[:n]
+        screen_positions = self.positions[:n]-(camera_position.x, camera_position.y)
+        if display_scale != 1:
+            screen_positions *= display_scale
+            radii = np.maximum(np.rint(radii*display_scale), 1).astype(radii.dtype)
+        # Top-left corner of each particle's sprite on screen
+        corners = np.floor(screen_positions)
+        corners -= radii[:, None]
+        # Skip particles outside of the screen bounds
+        sizes = radii*2
+        visible = np.flatnonzero(
+            (corners[:, 0]+sizes > screen_bounds.left)
+            & (corners[:, 0] < screen_bounds.right)
+            & (corners[:, 1]+sizes > screen_bounds.top)
+            & (corners[:, 1] < screen_bounds.bottom))
+        if len(visible) == 0:
+            return
+        colours = self.colours[visible].astype(np.int64)
+        keys = ((colours[:, 0]<<40) | (colours[:, 1]<<32)
+                | (colours[:, 2]<<24) | radii[visible])
+        # Look each sprite up once per frame. They're held for the frame,
+        # so the cache evicting them before the blits is harmless.
+        frame_sprites = {key: self._get_cached_sprite(key) for key in np.unique(keys).tolist()}
+        surface.blits(
+            [(frame_sprites[key], corner)
+             for key, corner in zip(keys.tolist(), corners[visible].astype(np.int64).tolist())],
+            doreturn=False)
@@ -0,0 +1,287 @@
+import collections
+import json
+import mmap
+import os
+import struct
+import sys
+import typing as t
+import zlib
+from array import array
+
+from eclipse import util
+from .streaming import ChunkStore
+from .tile import TileRegistry
+
+# Regions are square groups of chunks that share one file
+region_size = 32
+
+# Region file layout:
+#   header:       magic (4 bytes), version (uint16), reserved (uint16)
+#   offset table: region_size*region_size entries of (offset, length,
+#                 capacity) uint32s, indexed by local y*region_size+x.
+#                 An offset of 0 means the chunk has not been saved.
+#   chunk data:   zlib compressed 16x16 uint16 palette ids, little-endian,
+#                 each in a slot of `capacity` bytes
+region_magic = b"ECRG"
+region_version = 2
+header_format = "<4sHH"
+table_entry_format = "<III"
+header_size = struct.calcsize(header_format)
+table_entry_size = struct.calcsize(table_entry_format)
+table_size = region_size*region_size*table_entry_size
+
+# Record slots are allocated in whole sectors of this many bytes, so a
+# rewritten record can grow a little and still fit in its old slot
+sector_size = 128
+
+class RegionFile(object):
+    """An open region file, with its offset table kept in memory.
+
+    Records are rewritten in place when they fit in their slot, and
+    given a new slot at the end of the file otherwise. Slots only grow,
+    and a compressed chunk never needs more than a few sectors, so the
+    space left behind by moved records is bounded. compact() reclaims it.
+    """
+    path:str
+    file:t.BinaryIO
+    # (offset, length, capacity) of every chunk, flattened
+    table:array
+    # Where the next new slot goes
+    end:int
+    region_map:t.Union[mmap.mmap, None]
+
+    def __init__(self, path:str):
+        self.path = path
+        if not os.path.exists(path):
+            with open(path, "wb") as file:
+                file.write(struct.pack(header_format, region_magic, region_version, 0))
+                file.write(bytes(table_size))
+        self.file = open(path, "r+b")
+        magic, version, _ = struct.unpack(header_format, self.file.read(header_size))
+        if magic != region_magic or version != region_version:
+            self.file.close()
+            raise ValueError(f"{path} is not a version {region_version} region file")
+        self.table = array("I")
+        self.table.frombytes(self.file.read(table_size))
+        if sys.byteorder != "little":
+            self.table.byteswap()
+        self.end = self.file.seek(0, os.SEEK_END)
+        self.region_map = None
+
+    def read_record(self, index:int) -> t.Union[bytes, None]:
+        """Reads a chunk's record.
+
+        Args:
+            index (int): The chunk's index in the offset table.
+
+        Returns:
+            bytes | None: The record, or None if the chunk was never saved.
+        """
+        offset = self.table[index*3]
+        if offset == 0:
+            return None
+        if self.region_map is None:
+            self.region_map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.region_map[offset:offset+self.table[index*3+1]]
+
+    def write_record(self, index:int, record:bytes):
+        """Writes a chunk's record, reusing its slot if the record fits.
+
+        Args:
+            index (int): The chunk's index in the offset table.
+            record (bytes): The record.
+        """
+        table = self.table
+        offset = table[index*3]
+        capacity = table[index*3+2]
+        file = self.file
+        if offset == 0 or len(record) > capacity:
+            # Append a new slot, padded to whole sectors
+            offset = self.end
+            capacity = util.ceil_div(len(record), sector_size)*sector_size
+            self.end += capacity
+            self._close_map()
+            file.seek(offset)
+            file.write(record.ljust(capacity, b"\0"))
+        else:
+            file.seek(offset)
+            file.write(record)
+        table[index*3:index*3+3] = array("I", (offset, len(record), capacity))
+        file.seek(header_size+index*table_entry_size)
+        file.write(struct.pack(table_entry_format, offset, len(record), capacity))
+        file.flush()
+
+    def compact(self):
+        """Rewrites the region file with its records back to back, in
+        slots no larger than they need, reclaiming unused space. The
+        region file is closed afterwards.
+        """
+        records = [self.read_record(index) for index in range(region_size*region_size)]
+        self.close()
+        temporary_path = self.path+".tmp"
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        compacted = RegionFile(temporary_path)
+        for index, record in enumerate(records):
+            if record is not None:
+                compacted.write_record(index, record)
+        compacted.close()
+        os.replace(temporary_path, self.path)
+
+    def _close_map(self):
+        if self.region_map is not None:
+            self.region_map.close()
+            self.region_map = None
+
+    def close(self):
+        self._close_map()
+        self.file.close()
+
+class RegionFileStore(ChunkStore):
+    """Saves chunk tile ids to region files on disk, each holding up to
+    32x32 chunks behind an offset table. Reading a chunk memory maps its
+    region file and decompresses only that chunk's record, so nothing
+    else in the world is parsed.
+
+    Tile ids are stored as palette ids, and the palette (kept in
+    palette.json) maps them to registry identifiers, so saved worlds
+    stay valid when tiles are registered in a different order.
+
+    Up to max_open_regions region files are kept open between calls,
+    closing the least recently used. Call close() when done with the
+    store, and compact() to reclaim the space left in region files by
+    records that outgrew their slots.
+    """
+    directory:str
+    tile_registry:TileRegistry
+    palette:t.List[t.Union[str, None]]
+    palette_ids:t.Dict[t.Union[str, None], int]
+    regions:t.OrderedDict[t.Tuple[int, int], RegionFile]
+
+    # Most region files kept open at once
+    max_open_regions:int = 64
+
+    def __init__(self, directory:str, tile_registry:TileRegistry):
+        self.directory = directory
+        self.tile_registry = tile_registry
+        os.makedirs(directory, exist_ok=True)
+        self.palette = [None]
+        palette_path = self.get_palette_path()
+        if os.path.exists(palette_path):
+            with open(palette_path, "r") as file:
+                self.palette = json.load(file)
+        self.palette_ids = {identifier: i for i, identifier in enumerate(self.palette)}
+        # Open region files, from least to most recently used
+        self.regions = collections.OrderedDict()
+
+    def get_palette_path(self) -> str:
+        return os.path.join(self.directory, "palette.json")
+
+    def get_region_path(self, region_x:int, region_y:int) -> str:
+        return os.path.join(self.directory, f"r.{region_x}.{region_y}.ecr")
+
+    def get_region_location(self, x:int, y:int) -> t.Tuple[int, int, int]:
+        """Finds the region holding a chunk.
+
+        Args:
+            x (int): X location of the chunk.
+            y (int): Y location of the chunk.
+
+        Returns:
+            (region_x (int), region_y (int), table_index (int)): The region
+            location, and the chunk's index in the region's offset table.
+        """
+        return (x//region_size,
+                y//region_size,
+                (y%region_size)*region_size + x%region_size)
+
+    def _save_palette(self):
+        palette_path = self.get_palette_path()
+        with open(palette_path+".tmp", "w") as file:
+            json.dump(self.palette, file)
+        os.replace(palette_path+".tmp", palette_path)
+
+    def _get_region(self,
+                    region_x:int,
+                    region_y:int,
+                    create:bool=False) -> t.Union[RegionFile, None]:
+        region = self.regions.get((region_x, region_y))
+        if region is not None:
+            self.regions.move_to_end((region_x, region_y))
+            return region
+        path = self.get_region_path(region_x, region_y)
+        if not create and not os.path.exists(path):
+            return None
+        region = self.regions[(region_x, region_y)] = RegionFile(path)
+        while len(self.regions) > self.max_open_regions:
+            self.regions.popitem(last=False)[1].close()
+        return region
+
+    def save_chunk(self, x:int, y:int, tile_ids:array):
+        # Convert registry tile ids to palette ids, growing the palette
+        # with any identifiers it hasn't seen yet
+        palette_ids = self.palette_ids
+        entries = self.tile_registry.entries
+        id_map = {}
+        for tile_id in set(tile_ids):
+            identifier = None if tile_id == 0 else entries[tile_id].identifier
+            palette_id = palette_ids.get(identifier)
+            if palette_id is None:
+                palette_id = palette_ids[identifier] = len(self.palette)
+                self.palette.append(identifier)
+                self._save_palette()
+            id_map[tile_id] = palette_id
+        data = array("H", [id_map[tile_id] for tile_id in tile_ids])
+        if sys.byteorder != "little":
+            data.byteswap()
+        record = zlib.compress(data.tobytes())
+
+        region_x, region_y, table_index = self.get_region_location(x, y)
+        self._get_region(region_x, region_y, True).write_record(table_index, record)
+
+    def load_chunk(self, x:int, y:int) -> t.Union[array, None]:
+        region_x, region_y, table_index = self.get_region_location(x, y)
+        region = self._get_region(region_x, region_y)
+        if region is None:
+            return None
+        record = region.read_record(table_index)
+        if record is None:
+            return None
+        data = array("H")
+        data.frombytes(zlib.decompress(record))
+        if sys.byteorder != "little":
+            data.byteswap()
+        # Convert palette ids back to this registry's tile ids
+        get_tile_id = self.tile_registry.get_tile_id
+        id_map = {palette_id: get_tile_id(self.palette[palette_id]) for palette_id in set(data)}
+        return array("H", [id_map[palette_id] for palette_id in data])
+
+    def compact_region(self, region_x:int, region_y:int):
+        """Reclaims the unused space in a region file.
+
+        Args:
+            region_x (int): X location of the region.
+            region_y (int): Y location of the region.
+        """
+        # Region files are replaced when compacted, so they're reopened
+        # next time they're used
+        region = self.regions.pop((region_x, region_y), None)
+        if region is None:
+            path = self.get_region_path(region_x, region_y)
+            if not os.path.exists(path):
+                return
+            region = RegionFile(path)
+        region.compact()
+
+    def compact(self):
+        """Reclaims the unused space in every region file.
+        """
+        for file_name in os.listdir(self.directory):
+            parts = file_name.split(".")
+            if len(parts) == 4 and parts[0] == "r" and parts[3] == "ecr":
+                self.compact_region(int(parts[1]), int(parts[2]))
+
+    def close(self):
+        for region in self.regions.values():
+            region.close()
+        self.regions.clear()
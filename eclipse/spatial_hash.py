@@ -0,0 +1,215 @@
+import math
+import typing as t
+import pygame
+
+if t.TYPE_CHECKING:
+    from .entity import Entity
+
+type_cell_range = t.Tuple[int, int, int, int]
+
+class SpatialHash(object):
+    """The SpatialHash is a broadphase index that buckets entities into a
+    uniform grid of square cells, by default the same 256px size as chunks.
+
+    Each entity is stored in every cell its collider rect overlaps, so
+    queries only need to look at the entities in the cells they touch,
+    instead of scanning every entity in the world.
+    """
+    cell_size:int
+    cells:t.Dict[t.Tuple[int, int], t.Dict["Entity", None]]
+    entity_cells:t.Dict["Entity", type_cell_range]
+
+    def __init__(self, cell_size:int=256):
+        self.cell_size = cell_size
+        # Cells hold their entities as dict keys, an insertion ordered set
+        self.cells = {}
+        self.entity_cells = {}
+
+    def __len__(self) -> int:
+        return len(self.entity_cells)
+
+    def __contains__(self, entity:"Entity") -> bool:
+        return entity in self.entity_cells
+
+    def get_cell_range(self, rect:pygame.Rect) -> type_cell_range:
+        """Gets the inclusive range of cells a rect overlaps.
+
+        Args:
+            rect (pygame.Rect): The rect in world space.
+
+        Returns:
+            (min_x, min_y, max_x, max_y): The cell range.
+        """
+        cell_size = self.cell_size
+        return (
+            rect.left//cell_size,
+            rect.top//cell_size,
+            max(rect.left, rect.right-1)//cell_size,
+            max(rect.top, rect.bottom-1)//cell_size)
+
+    def _add_to_cells(self, entity:"Entity", cell_range:type_cell_range):
+        cells = self.cells
+        for y in range(cell_range[1], cell_range[3]+1):
+            for x in range(cell_range[0], cell_range[2]+1):
+                cell = cells.get((x, y))
+                if cell is None:
+                    cell = cells[(x, y)] = {}
+                cell[entity] = None
+
+    def _remove_from_cells(self, entity:"Entity", cell_range:type_cell_range):
+        cells = self.cells
+        for y in range(cell_range[1], cell_range[3]+1):
+            for x in range(cell_range[0], cell_range[2]+1):
+                cell = cells[(x, y)]
+                del cell[entity]
+                if not cell:
+                    del cells[(x, y)]
+
+    def update(self, entity:"Entity"):
+        """Inserts an entity, or moves it to the cells its collider
+        rect overlaps now. Does nothing if those cells haven't changed.
+
+        Args:
+            entity (Entity): The entity to insert or update.
+        """
+        cell_range = self.get_cell_range(entity.collider_rect)
+        old_cell_range = self.entity_cells.get(entity)
+        if old_cell_range == cell_range:
+            return
+        if old_cell_range is not None:
+            self._remove_from_cells(entity, old_cell_range)
+        self._add_to_cells(entity, cell_range)
+        self.entity_cells[entity] = cell_range
+
+    def remove(self, entity:"Entity"):
+        """Removes an entity from the index, if it's in it.
+
+        Args:
+            entity (Entity): The entity to remove.
+        """
+        cell_range = self.entity_cells.pop(entity, None)
+        if cell_range is not None:
+            self._remove_from_cells(entity, cell_range)
+
+    def clear(self):
+        self.cells.clear()
+        self.entity_cells.clear()
+
+    def query_rect(self, rect:pygame.Rect) -> t.List["Entity"]:
+        """Finds every entity whose collider rect overlaps a rect.
+
+        Args:
+            rect (pygame.Rect): The rect in world space.
+
+        Returns:
+            List[Entity]: The overlapping entities.
+        """
+        cell_range = self.get_cell_range(rect)
+        cells = self.cells
+        found = {}
+        for y in range(cell_range[1], cell_range[3]+1):
+            for x in range(cell_range[0], cell_range[2]+1):
+                cell = cells.get((x, y))
+                if cell is None: continue
+                for entity in cell:
+                    if entity not in found and entity.collider_rect.colliderect(rect):
+                        found[entity] = None
+        return list(found)
+
+    def query_radius(self,
+                     position:pygame.Vector2,
+                     radius:float) -> t.List["Entity"]:
+        """Finds every entity whose collider rect overlaps a circle.
+
+        Args:
+            position (pygame.Vector2): Center of the circle in world space.
+            radius (float): Radius of the circle.
+
+        Returns:
+            List[Entity]: The overlapping entities.
+        """
+        x, y = position.x, position.y
+        bounds = pygame.Rect(
+            math.floor(x-radius), math.floor(y-radius),
+            math.ceil(radius*2)+1, math.ceil(radius*2)+1)
+        radius_squared = radius*radius
+        found = []
+        for entity in self.query_rect(bounds):
+            rect = entity.collider_rect
+            # Distance from the circle center to the closest point on the rect
+            dx = x-min(max(x, rect.left), rect.right)
+            dy = y-min(max(y, rect.top), rect.bottom)
+            if dx*dx+dy*dy <= radius_squared:
+                found.append(entity)
+        return found
+
+    def query_nearest(self,
+                      position:pygame.Vector2,
+                      max_radius:float,
+                      entity_type:t.Union[type, None]=None,
+                      exclude:t.Union["Entity", None]=None)\
+            -> t.Union["Entity", None]:
+        """Finds the entity whose collider rect center is nearest to a
+        position, searching outwards one ring of cells at a time.
+
+        Args:
+            position (pygame.Vector2): The position in world space.
+            max_radius (float): The furthest distance to search. May be
+            math.inf to search the whole index.
+            entity_type (type, optional): Only consider entities that are
+            instances of this type. Defaults to None.
+            exclude (Entity, optional): An entity to ignore, such as
+            the one doing the search. Defaults to None.
+
+        Returns:
+            Entity | None: The nearest entity, if any is in range.
+        """
+        cell_size = self.cell_size
+        cells = self.cells
+        origin_x = int(position.x//cell_size)
+        origin_y = int(position.y//cell_size)
+        best = None
+        best_distance_squared = max_radius*max_radius
+        if math.isinf(max_radius):
+            # Never search further out than the furthest occupied cell
+            max_ring = 0
+            for x, y in cells:
+                max_ring = max(max_ring, abs(x-origin_x), abs(y-origin_y))
+        else:
+            max_ring = int(max_radius//cell_size)+1
+        seen = set()
+        ring = 0
+        while ring <= max_ring:
+            # Cells on the border of a square ring around the origin cell
+            if ring == 0:
+                ring_cells = [(origin_x, origin_y)]
+            else:
+                ring_cells = []
+                for x in range(origin_x-ring, origin_x+ring+1):
+                    ring_cells.append((x, origin_y-ring))
+                    ring_cells.append((x, origin_y+ring))
+                for y in range(origin_y-ring+1, origin_y+ring):
+                    ring_cells.append((origin_x-ring, y))
+                    ring_cells.append((origin_x+ring, y))
+            for key in ring_cells:
+                cell = cells.get(key)
+                if cell is None: continue
+                for entity in cell:
+                    if entity in seen: continue
+                    seen.add(entity)
+                    if entity is exclude: continue
+                    if entity_type is not None and not isinstance(entity, entity_type):
+                        continue
+                    center = entity.collider_rect.center
+                    dx = center[0]-position.x
+                    dy = center[1]-position.y
+                    distance_squared = dx*dx+dy*dy
+                    if distance_squared <= best_distance_squared:
+                        best = entity
+                        best_distance_squared = distance_squared
+            # Anything in the next ring out is at least this far away
+            nearest_unsearched = ring*cell_size
+            if nearest_unsearched*nearest_unsearched > best_distance_squared:
+                break
+            ring += 1
+        return best
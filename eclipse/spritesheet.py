@@ -1,12 +1,37 @@
+import typing as t
+
 import pygame
 
+from eclipse import util
+
 class Spritesheet(object):
+    """Spritesheets load an image and slice sprites out of it.
+
+    Sprites are cached by their rect, so every call for the same rect
+    returns the same shared surface instead of allocating a new one.
+    Copy a sprite before drawing onto it.
+    """
+    color_key: tuple
+    surface: pygame.Surface
+    sprites: t.Dict[t.Tuple[int, int, int, int], pygame.Surface]
+
     def __init__(self,
                  image_path:str,
                  color_key:tuple=(0,0,0)):
         self.color_key = color_key
         self.surface = pygame.image.load(image_path)
         self.surface.set_colorkey(self.color_key)
+        self.sprites = {}
+        self.convert()
+
+    def convert(self):
+        """Converts the sheet and its cached sprites to the display's
+        pixel format. Happens on load if there is a display, otherwise
+        call this once one has been created.
+        """
+        self.surface = util.convert_surface(self.surface, self.color_key)
+        for key, sprite_surface in self.sprites.items():
+            self.sprites[key] = util.convert_surface(sprite_surface, self.color_key)
     
     def get(self,
             rect:pygame.Rect) -> pygame.Surface:
@@ -16,10 +41,64 @@ class Spritesheet(object):
             rect (pygame.Rect): The sprite rect.
 
         Returns:
-            pygame.Surface: The sprite surface.
+            pygame.Surface: The sprite surface, shared with every other
+            caller asking for the same rect.
+        """
+        key = (rect[0], rect[1], rect[2], rect[3])
+        sprite_surface = self.sprites.get(key)
+        if sprite_surface is None:
+            sprite_surface = pygame.Surface(key[2:])
+            sprite_surface.fill(self.color_key)
+            sprite_surface.set_colorkey(self.color_key)
+            sprite_surface.blit(self.surface, (-key[0], -key[1]))
+            sprite_surface = util.convert_surface(sprite_surface, self.color_key)
+            self.sprites[key] = sprite_surface
+        return sprite_surface
+
+    def get_grid(self,
+                 cell_size:t.Tuple[int, int],
+                 margin:t.Tuple[int, int]=(0, 0),
+                 spacing:t.Tuple[int, int]=(0, 0)) -> t.List[t.List[pygame.Surface]]:
+        """Slices the sheet into a grid of equally sized sprites.
+
+        Args:
+            cell_size (Tuple[int, int]): Width and height of each sprite.
+            margin (Tuple[int, int], optional): Space between the edge of
+            the sheet and the first sprite. Defaults to (0, 0).
+            spacing (Tuple[int, int], optional): Space between neighbouring
+            sprites. Defaults to (0, 0).
+
+        Returns:
+            List[List[pygame.Surface]]: Rows of sprites, covering every
+            whole cell that fits in the sheet.
+        """
+        sheet_width, sheet_height = self.surface.get_size()
+        step_x = cell_size[0]+spacing[0]
+        step_y = cell_size[1]+spacing[1]
+        columns = max(0, (sheet_width-margin[0]+spacing[0])//step_x)
+        rows = max(0, (sheet_height-margin[1]+spacing[1])//step_y)
+        return [[self.get(pygame.Rect(margin[0]+x*step_x, margin[1]+y*step_y, *cell_size))
+                 for x in range(columns)]
+                for y in range(rows)]
+
+    def get_strip(self,
+                  rect:pygame.Rect,
+                  frames:int,
+                  spacing:int=0,
+                  vertical:bool=False) -> t.List[pygame.Surface]:
+        """Gets the frames of an animation laid out in a row.
+
+        Args:
+            rect (pygame.Rect): The rect of the first frame.
+            frames (int): The number of frames.
+            spacing (int, optional): Space between frames. Defaults to 0.
+            vertical (bool, optional): Whether the frames run down the
+            sheet instead of across. Defaults to False.
+
+        Returns:
+            List[pygame.Surface]: The frame sprites, in order.
         """
-        sprite_surface = pygame.Surface(rect.size)
-        sprite_surface.fill(self.color_key)
-        sprite_surface.set_colorkey(self.color_key)
-        sprite_surface.blit(self.surface, (-rect.x, -rect.y))
-        return sprite_surface
\ No newline at end of file
+        step_x = 0 if vertical else rect[2]+spacing
+        step_y = rect[3]+spacing if vertical else 0
+        return [self.get(pygame.Rect(rect[0]+i*step_x, rect[1]+i*step_y, rect[2], rect[3]))
+                for i in range(frames)]
@@ -0,0 +1,98 @@
+import collections
+import time
+import typing as t
+
+class FrameStats(object):
+    """FrameStats collects per-frame timings and counters, and keeps them
+    for the last `history_length` frames.
+
+    Timings are recorded in milliseconds with start()/lap() pairs, and
+    counters with count() and set(). Everything recorded goes into the
+    frame in progress until end_frame() is called, which moves it into
+    the history.
+
+    While disabled, start()/lap() return straight away and callers are
+    expected to check stats.enabled before counting, so the stats cost
+    almost nothing when turned off.
+    """
+    enabled: bool
+    history: t.Deque[t.Dict[str, float]]
+    current: t.Dict[str, float]
+
+    def __init__(self, history_length:int=120, enabled:bool=False):
+        self.enabled = enabled
+        self.history = collections.deque(maxlen=history_length)
+        self.current = {}
+
+    def start(self) -> float:
+        """Starts timing a phase.
+
+        Returns:
+            float: The start time, to pass to lap().
+        """
+        if not self.enabled:
+            return 0.0
+        return time.perf_counter()
+
+    def lap(self, name:str, start:float) -> float:
+        """Adds the time since `start` to a phase's timing.
+
+        Args:
+            name (str): The phase name.
+            start (float): The time returned from start() or lap().
+
+        Returns:
+            float: The current time, so the next phase can start timing
+            from where this one stopped.
+        """
+        if not self.enabled:
+            return 0.0
+        now = time.perf_counter()
+        self.current[name] = self.current.get(name, 0.0)+(now-start)*1000
+        return now
+
+    def count(self, name:str, amount:int=1):
+        self.current[name] = self.current.get(name, 0)+amount
+
+    def set(self, name:str, value:float):
+        self.current[name] = value
+
+    def end_frame(self):
+        """Finishes the frame in progress and adds it to the history.
+        """
+        if not self.enabled:
+            return
+        self.history.append(self.current)
+        self.current = {}
+
+    def get_last_frame(self) -> t.Dict[str, float]:
+        """Gets the stats of the most recently finished frame.
+
+        Returns:
+            Dict[str, float]: Timings and counters by name.
+        """
+        if not self.history:
+            return {}
+        return self.history[-1]
+
+    def get_summary(self) -> t.Dict[str, t.Dict[str, float]]:
+        """Summarises every stat across the frame history. Stats missing
+        from a frame count as 0 for that frame.
+
+        Returns:
+            Dict[str, Dict[str, float]]: The mean and max of each stat.
+        """
+        frames = len(self.history)
+        summary = {}
+        for frame in self.history:
+            for name, value in frame.items():
+                stat = summary.get(name)
+                if stat is None:
+                    stat = summary[name] = {"mean": 0.0, "max": value}
+                stat["mean"] += value/frames
+                stat["max"] = max(stat["max"], value)
+        return summary
+
+    def clear(self):
+        self.history.clear()
+        self.current = {}
@@ -0,0 +1,256 @@
+import abc
+import collections
+import typing as t
+from array import array
+import pygame
+
+from .chunk import Chunk
+
+if t.TYPE_CHECKING:
+    from .world import World
+    from .generation import ChunkGenerationPool
+
+type_chunk_key = t.Tuple[int, int]
+
+class ChunkStore(abc.ABC):
+    """Backing store that evicted chunks are saved to, and that chunks
+    are loaded back from when they come into range again.
+
+    Stores only hold chunk tile ids, never surfaces. Subclasses
+    implement save_chunk() and load_chunk().
+    """
+    @abc.abstractmethod
+    def save_chunk(self, x:int, y:int, tile_ids:array):
+        """Saves a chunk's tile ids.
+
+        Args:
+            x (int): X location of the chunk.
+            y (int): Y location of the chunk.
+            tile_ids (array): The tile ids.
+        """
+
+    @abc.abstractmethod
+    def load_chunk(self, x:int, y:int) -> t.Union[array, None]:
+        """Loads a chunk's tile ids.
+
+        Args:
+            x (int): X location of the chunk.
+            y (int): Y location of the chunk.
+
+        Returns:
+            array | None: The tile ids, or None if the chunk
+            was never saved.
+        """
+
+    def load_chunk_into(self, world:"World", x:int, y:int) -> t.Union[Chunk, None]:
+        """Loads a chunk from the store and adds it to a world.
+
+        Args:
+            world (World): The world to add the chunk to.
+            x (int): X location of the chunk.
+            y (int): Y location of the chunk.
+
+        Returns:
+            Chunk | None: The loaded chunk, or None if the chunk
+            was never saved.
+        """
+        tile_ids = self.load_chunk(x, y)
+        if tile_ids is None:
+            return None
+        chunk = Chunk(world.tile_registry, world.headless)
+        world.add_chunk(x, y, chunk)
+        chunk.load_tile_ids(tile_ids)
+        return chunk
+
+    def save_world(self, world:"World"):
+        """Saves every chunk currently loaded in a world.
+
+        Args:
+            world (World): The world to save.
+        """
+        for (x, y), chunk in world.chunks.items():
+            self.save_chunk(x, y, chunk.tile_ids)
+
+class MemoryChunkStore(ChunkStore):
+    """Keeps evicted chunks in memory as packed tile id bytes,
+    512 bytes per chunk instead of a chunk and its surface.
+    """
+    chunks:t.Dict[type_chunk_key, bytes]
+
+    def __init__(self):
+        self.chunks = {}
+
+    def save_chunk(self, x:int, y:int, tile_ids:array):
+        self.chunks[(x, y)] = tile_ids.tobytes()
+
+    def load_chunk(self, x:int, y:int) -> t.Union[array, None]:
+        data = self.chunks.get((x, y))
+        if data is None:
+            return None
+        tile_ids = array("H")
+        tile_ids.frombytes(data)
+        return tile_ids
+
+class ChunkStreamer(object):
+    """The ChunkStreamer keeps the chunks around a set of focus positions
+    (such as the camera, or every player on a server) loaded, and evicts
+    the rest of a World's chunks to a ChunkStore.
+
+    Every update, chunks within load_radius of a focus are loaded from
+    the store, or created by the world's chunk generator if the store
+    doesn't have them. Chunks further than unload_radius from every focus
+    are saved to the store and removed from the world. If more than
+    max_loaded_chunks are still loaded, the least recently used chunks
+    outside of the load radius are evicted too.
+
+    Given a ChunkGenerationPool, chunks missing from the store are
+    generated in the background instead, and added once they're ready.
+
+    Evicted chunks whose tiles haven't changed since the streamer loaded,
+    generated or saved them aren't saved again, since the store (or the
+    generator) already has them.
+
+    Radii are in chunks, measured as the larger of the x and y distance.
+    """
+    world:"World"
+    store:ChunkStore
+    load_radius:int
+    unload_radius:int
+    max_loaded_chunks:int
+    generation_pool:t.Union["ChunkGenerationPool", None]
+    last_used:t.OrderedDict[type_chunk_key, None]
+    unchanged_versions:t.Dict[type_chunk_key, t.Tuple[Chunk, int]]
+
+    def __init__(self,
+                 world:"World",
+                 store:t.Union[ChunkStore, None]=None,
+                 load_radius:int=2,
+                 unload_radius:int=4,
+                 max_loaded_chunks:int=256,
+                 generation_pool:t.Union["ChunkGenerationPool", None]=None):
+        self.world = world
+        self.store = store if store is not None else MemoryChunkStore()
+        self.load_radius = load_radius
+        self.unload_radius = max(unload_radius, load_radius)
+        self.max_loaded_chunks = max_loaded_chunks
+        self.generation_pool = generation_pool
+        # Loaded chunk keys, from least to most recently in range
+        self.last_used = collections.OrderedDict()
+        # The chunk and chunk.tiles_version at each location when the
+        # streamer last loaded, generated or saved it
+        self.unchanged_versions = {}
+        self._last_centers = None
+
+    def load_chunk(self, x:int, y:int):
+        """Loads a chunk into the world from the store, or
+        generates it if the store doesn't have it.
+
+        Args:
+            x (int): X location of the chunk.
+            y (int): Y location of the chunk.
+        """
+        world = self.world
+        if (x, y) in world.chunks:
+            return
+        chunk = self.store.load_chunk_into(world, x, y)
+        if chunk is None:
+            if self.generation_pool is not None:
+                self.generation_pool.request_chunk(x, y)
+                return
+            chunk = world.get_chunk(x, y, True)
+        self.unchanged_versions[(x, y)] = (chunk, chunk.tiles_version)
+
+    def evict_chunk(self, x:int, y:int):
+        """Saves a chunk to the store and removes it from the world.
+
+        Args:
+            x (int): X location of the chunk.
+            y (int): Y location of the chunk.
+        """
+        chunk = self.world.remove_chunk(x, y)
+        self.last_used.pop((x, y), None)
+        unchanged_version = self.unchanged_versions.pop((x, y), None)
+        if chunk is None:
+            return
+        if (unchanged_version is not None
+                and unchanged_version[0] is chunk
+                and unchanged_version[1] == chunk.tiles_version):
+            return
+        self.store.save_chunk(x, y, chunk.tile_ids)
+
+    def save_all(self):
+        """Saves every loaded chunk to the store, without evicting them.
+        """
+        self.store.save_world(self.world)
+        self.unchanged_versions = {
+            key: (chunk, chunk.tiles_version)
+            for key, chunk in self.world.chunks.items()}
+
+    def update(self, positions:t.Iterable[pygame.Vector2]):
+        """Loads and evicts chunks around the focus positions.
+
+        Args:
+            positions (Iterable[pygame.Vector2]): Focus positions in
+            world space, such as the camera center or players.
+        """
+        world = self.world
+        if self.generation_pool is not None:
+            # Chunks the pool adds are as generated
+            arriving = [key for key in self.generation_pool.pending
+                        if key not in world.chunks]
+            self.generation_pool.poll()
+            for key in arriving:
+                chunk = world.chunks.get(key)
+                if chunk is not None and key not in self.generation_pool.pending:
+                    self.unchanged_versions[key] = (chunk, chunk.tiles_version)
+        centers = sorted(set(
+            world.world_location_to_chunk_location(position.x, position.y)
+            for position in positions))
+        # Nothing can change if the focus chunks and loaded chunks haven't
+        if centers == self._last_centers and len(world.chunks) == len(self.last_used):
+            return
+        self._last_centers = centers
+
+        # Load chunks in range, marking them as the most recently used
+        load_radius = self.load_radius
+        last_used = self.last_used
+        in_range = set()
+        for center_x, center_y in centers:
+            for y in range(center_y-load_radius, center_y+load_radius+1):
+                for x in range(center_x-load_radius, center_x+load_radius+1):
+                    in_range.add((x, y))
+        for key in in_range:
+            self.load_chunk(*key)
+            # Chunks still being generated get tracked once they arrive
+            if key in world.chunks:
+                last_used[key] = None
+                last_used.move_to_end(key)
+
+        # Track chunks that were loaded some other way as least recently used
+        for key in world.chunks:
+            if key not in last_used:
+                last_used[key] = None
+                last_used.move_to_end(key, last=False)
+
+        # Evict chunks that are out of range of every center
+        unload_radius = self.unload_radius
+        for key in list(last_used):
+            x, y = key
+            for center_x, center_y in centers:
+                if abs(x-center_x) <= unload_radius and abs(y-center_y) <= unload_radius:
+                    break
+            else:
+                self.evict_chunk(x, y)
+        if self.generation_pool is not None:
+            for key in list(self.generation_pool.pending):
+                if key not in in_range:
+                    self.generation_pool.cancel(*key)
+
+        # Evict the least recently used chunks while over budget
+        if len(last_used) > self.max_loaded_chunks:
+            for key in list(last_used):
+                if len(last_used) <= self.max_loaded_chunks:
+                    break
+                if key in in_range:
+                    continue
+                self.evict_chunk(*key)
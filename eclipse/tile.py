@@ -1,17 +1,80 @@
 import typing as t
 
+import numpy as np
 import pygame
 
+from eclipse import util
+
+# Tile collision types, as stored in each chunk's collision grid
+COLLISION_NONE = 0
+COLLISION_FULL = 1
+COLLISION_CUSTOM = 2
+
 class TileRegistryEntry(object):
     identifier:str
-    def __init__(self, identifier:str, surface:pygame.Surface):
+    id:int
+    tile:"Tile"
+    surface:t.Union[pygame.Surface, None]
+    average_colour:t.Union[t.Tuple[int, int, int], None]
+    def __init__(self, identifier:str, surface:t.Union[pygame.Surface, None]=None):
         self.identifier = identifier
+        # Headless worlds never draw, so they can register tiles without
+        # a surface. Surfaces are copied before keying out black, since
+        # spritesheet sprites are shared.
         self.surface = surface
-        self.surface.set_colorkey((0,0,0))
+        if self.surface is not None:
+            self.surface = self.surface.copy()
+            self.surface.set_colorkey((0,0,0))
+
+        # The numeric id is assigned by the TileRegistry when the
+        # entry is registered. 0 is reserved for "no tile".
+        self.id = 0
+
+        # Shared Tile instance handed out by chunks using this entry
+        self.tile = Tile(identifier)
 
         # Collision information should also be stored in the TileRegistryEntry;
         self.rects = [pygame.Rect((0,0), (16,16))]
 
+        # Colour of the tile on minimaps, set when the entry is registered
+        self.average_colour = None
+
+    def update_average_colour(self):
+        """Averages the colour of the tile's visible pixels, skipping
+        colorkeyed and fully transparent pixels. Tiles without a surface
+        or without any visible pixels get None.
+        """
+        self.average_colour = None
+        if self.surface is None:
+            return
+        pixels = pygame.surfarray.array3d(self.surface).reshape(-1, 3)
+        visible = np.ones(len(pixels), dtype=bool)
+        colorkey = self.surface.get_colorkey()
+        if colorkey is not None:
+            visible &= np.any(pixels != colorkey[:3], axis=1)
+        if self.surface.get_flags() & pygame.SRCALPHA:
+            visible &= pygame.surfarray.array_alpha(self.surface).reshape(-1) > 0
+        if visible.any():
+            self.average_colour = tuple(int(c) for c in pixels[visible].mean(axis=0).round())
+
+    def get_collision_type(self) -> int:
+        """Classifies this tile's collision shape, so chunks can answer
+        collisions against full tiles without testing any rects.
+
+        Chunks read this when a tile is placed, so changing rects
+        afterwards requires chunk.update_collision_grid().
+
+        Returns:
+            int: COLLISION_NONE, COLLISION_FULL or COLLISION_CUSTOM.
+        """
+        if not self.rects:
+            return COLLISION_NONE
+        full_rect = pygame.Rect((0,0), (16,16))
+        for rect in self.rects:
+            if rect.contains(full_rect):
+                return COLLISION_FULL
+        return COLLISION_CUSTOM
+
     def collide_point(self, point:pygame.Vector2):
         for rect in self.rects:
             if rect.collidepoint(point):
@@ -26,16 +89,59 @@ class TileRegistryEntry(object):
         return False
 
 class TileRegistry(object):
+    """The TileRegistry assigns numeric ids to tiles, and packs every
+    registered tile surface into one atlas surface that chunks draw
+    their tiles from.
+
+    Tile surfaces are converted to the display's pixel format when they
+    are registered. Tiles registered before the display was created are
+    converted with convert_surfaces(), or when the atlas is next built.
+    """
     registry: t.Dict[str, TileRegistryEntry]
+    entries: t.List[t.Union[TileRegistryEntry, None]]
+    revision: int
+    atlas: t.Union[pygame.Surface, None]
+    atlas_areas: t.List[t.Tuple[int, int, int, int]]
+    atlas_mips: t.Dict[int, t.Tuple[pygame.Surface, t.List[t.Tuple[int, int, int, int]]]]
+    _atlas_converted: bool
+
+    # Width of the atlas in tiles
+    atlas_columns: int = 16
+
     def __init__(self):
         self.registry = {}
+        # Entries indexed by their numeric id, where id 0 is empty space
+        self.entries = [None]
+        # Incremented whenever a tile is registered
+        self.revision = 0
+        self.atlas = None
+        self.atlas_areas = []
+        # Downsampled atlases by mip level, for zoomed out chunks
+        self.atlas_mips = {}
+        self._atlas_converted = False
     
     def register_tile(self, tile_registry_entry:TileRegistryEntry) -> TileRegistryEntry:
-        """Adds a tile to the tile registry.
+        """Adds a tile to the tile registry, and assigns it a numeric id.
+
+        Registering a new entry under an existing identifier replaces
+        the old entry but keeps its id, so placed tiles stay valid.
 
         Args:
             tile_registry_entry (TileRegistryEntry): Tile to register.
         """
+        if tile_registry_entry.surface is not None:
+            tile_registry_entry.surface = util.convert_surface(
+                tile_registry_entry.surface, (0,0,0))
+        tile_registry_entry.update_average_colour()
+        self.atlas = None
+        self.revision += 1
+        existing = self.registry.get(tile_registry_entry.identifier)
+        if existing is not None:
+            tile_registry_entry.id = existing.id
+            self.entries[existing.id] = tile_registry_entry
+        else:
+            tile_registry_entry.id = len(self.entries)
+            self.entries.append(tile_registry_entry)
         self.registry[tile_registry_entry.identifier] = tile_registry_entry
         return tile_registry_entry
     
@@ -43,7 +149,101 @@ class TileRegistry(object):
             -> t.Union[TileRegistryEntry, None]:
         return self.registry.get(identifier)
     
+    def get_tile_registry_entry_by_id(self, tile_id:int)\
+            -> t.Union[TileRegistryEntry, None]:
+        return self.entries[tile_id]
+    
+    def get_tile_id(self, identifier:t.Union[str, None]) -> int:
+        """Gets the numeric id for a tile identifier.
+
+        Args:
+            identifier (str | None): The tile identifier, or None
+            for empty space.
+
+        Raises:
+            KeyError: If the identifier has not been registered.
+
+        Returns:
+            int: The numeric tile id.
+        """
+        if identifier is None:
+            return 0
+        tile_registry_entry = self.registry.get(identifier)
+        if tile_registry_entry is None:
+            raise KeyError(f"Tile '{identifier}' is not registered")
+        return tile_registry_entry.id
+
+    def convert_surfaces(self):
+        """Converts every registered tile surface to the display's pixel
+        format, for tiles registered before the display was created.
+        """
+        for tile_registry_entry in self.entries[1:]:
+            if tile_registry_entry.surface is not None:
+                tile_registry_entry.surface = util.convert_surface(
+                    tile_registry_entry.surface, (0,0,0))
+        self.atlas = None
+
+    def build_atlas(self):
+        """Packs every tile surface into the atlas, in a grid of 16x16
+        cells where tile id n is cell n.
+
+        Each cell holds its tile already drawn over black, exactly as it
+        appears on a chunk surface, so chunks copy cells with plain
+        (colorkey-free) blits. Tiles are cropped to 16x16.
+        """
+        if not self._atlas_converted and pygame.display.get_surface() is not None:
+            self.convert_surfaces()
+            self._atlas_converted = True
+        columns = self.atlas_columns
+        rows = -(len(self.entries) // -columns)
+        atlas = pygame.Surface((columns*16, rows*16))
+        atlas.fill((0,0,0))
+        self.atlas_areas = []
+        for tile_id, tile_registry_entry in enumerate(self.entries):
+            area = ((tile_id%columns)*16, (tile_id//columns)*16, 16, 16)
+            self.atlas_areas.append(area)
+            if tile_registry_entry is None or tile_registry_entry.surface is None:
+                continue
+            atlas.blit(tile_registry_entry.surface, area[:2], (0, 0, 16, 16))
+        self.atlas = util.convert_surface(atlas)
+        self.atlas_mips = {}
+
+    def get_atlas(self, level:int=0)\
+            -> t.Tuple[pygame.Surface, t.List[t.Tuple[int, int, int, int]]]:
+        """Gets the tile atlas, building it if tiles were registered
+        since it was last built, or if a display has been created since.
+
+        Args:
+            level (int, optional): The mip level, where each level is
+            downsampled to half the size of the last. Defaults to 0,
+            for the full size atlas.
+
+        Returns:
+            (atlas (pygame.Surface), atlas_areas (List[Tuple[int, int, int, int]])):
+            The atlas, and the area of each tile id's cell in it.
+        """
+        if (self.atlas is None
+                or (not self._atlas_converted and pygame.display.get_surface() is not None)):
+            self.build_atlas()
+        if level == 0:
+            return self.atlas, self.atlas_areas
+        atlas_mip = self.atlas_mips.get(level)
+        if atlas_mip is None:
+            # Halving with smoothscale averages each 2x2 block of pixels,
+            # and cells stay aligned to the blocks, so tiles never bleed
+            # into their neighbours
+            atlas = self.get_atlas(level-1)[0]
+            atlas = pygame.transform.smoothscale(
+                atlas, (atlas.get_width()//2, atlas.get_height()//2))
+            cell_size = 16>>level
+            columns = self.atlas_columns
+            atlas_areas = [((tile_id%columns)*cell_size, (tile_id//columns)*cell_size,
+                            cell_size, cell_size)
+                           for tile_id in range(len(self.atlas_areas))]
+            atlas_mip = self.atlas_mips[level] = (util.convert_surface(atlas), atlas_areas)
+        return atlas_mip
+    
 class Tile(object):
     identifier: str
     def __init__(self, identifier:str):
-        self.identifier = identifier
\ No newline at end of file
+        self.identifier = identifier
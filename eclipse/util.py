@@ -1,3 +1,7 @@
+import typing as t
+
+import pygame
+
 def ceil_div(a:float, b:float) -> int:
     """Returns the ceiling of a / b.
 
@@ -21,4 +25,30 @@ def clamp(n:float, a:float, b:float) -> float:
     Returns:
         float: The clamped value.
     """
-    return min(b, max(a, n))
\ No newline at end of file
+    return min(b, max(a, n))
+
+def convert_surface(surface:pygame.Surface,
+                    colorkey:t.Union[tuple, None]=None) -> pygame.Surface:
+    """Converts a surface to the display's pixel format, so blitting it
+    is a plain copy instead of converting every pixel. Colorkeyed
+    surfaces are also RLE accelerated.
+
+    Surfaces are returned unchanged while there is no display.
+
+    Args:
+        surface (pygame.Surface): The surface to convert.
+        colorkey (tuple, optional): The colorkey to set on the converted
+        surface. Defaults to None, for no colorkey.
+
+    Returns:
+        pygame.Surface: The converted surface.
+    """
+    if pygame.display.get_surface() is None:
+        return surface
+    if surface.get_flags() & pygame.SRCALPHA:
+        converted = surface.convert_alpha()
+    else:
+        converted = surface.convert()
+    if colorkey is not None:
+        converted.set_colorkey(colorkey, pygame.RLEACCEL)
+    return converted
@@ -1,47 +1,354 @@
+import collections
+import random
+import time
 import typing as t
+from array import array
 
+import numpy as np
 import pygame
 
 from eclipse import util
 from .chunk import Chunk
-from .tile import TileRegistry
+from .chunk_layer import ChunkLayer
+from .tile import TileRegistry, COLLISION_NONE, COLLISION_FULL, COLLISION_CUSTOM
 from .particle import Particle
+from .particle_system import ParticleSystem
 from .entity import Entity
+from .spatial_hash import SpatialHash
+from .stats import FrameStats
 
 class ChunkGenerator(object):
-    def __init__(self):
-        ...
+    """Chunk generators create the tiles of chunks that don't exist yet.
+
+    Subclasses override generate(), which returns 16x16 indices into the
+    generator's palette of tile identifiers. generate() must only depend
+    on the seed and the chunk location, so results are deterministic, and
+    generators must be picklable so that generate() can run in a worker
+    process (see ChunkGenerationPool). Turning the result into a Chunk
+    happens on the main thread, in build_chunk().
+
+    The base generator creates empty chunks.
+    """
+    seed:int
+    palette:t.List[t.Union[str, None]]
+
+    def __init__(self, seed:int=0):
+        self.seed = seed
+        # Tile identifiers by palette index, where index 0 is empty space
+        self.palette = [None]
+
+    def get_chunk_random(self, x:int, y:int) -> random.Random:
+        """Gets a random number generator seeded from the generator
+        seed and a chunk location, which is the same in every process.
+
+        Args:
+            x (int): X location of the chunk.
+            y (int): Y location of the chunk.
+
+        Returns:
+            random.Random: The seeded generator.
+        """
+        return random.Random(f"{self.seed}:{x}:{y}")
+
+    def generate(self, x:int, y:int) -> t.Union[array, None]:
+        """Generates the tiles of a chunk.
+
+        Args:
+            x (int): X location of the chunk.
+            y (int): Y location of the chunk.
+
+        Returns:
+            array | None: 16x16 palette indices in an array("H"), laid
+            out like Chunk.tile_ids, or None for an empty chunk.
+        """
+        return None
+
+    def build_chunk(self,
+                    palette_indices:t.Union[array, None],
+                    tile_registry:TileRegistry,
+                    headless:bool=False) -> Chunk:
+        """Builds a chunk from the output of generate().
+
+        Args:
+            palette_indices (array | None): The generated tiles.
+            tile_registry (TileRegistry): Registry to map the palette with.
+            headless (bool, optional): Whether to create a headless chunk.
+            Defaults to False.
+
+        Returns:
+            Chunk: The new chunk.
+        """
+        chunk = Chunk(tile_registry, headless)
+        if palette_indices is not None:
+            tile_ids = [tile_registry.get_tile_id(identifier) for identifier in self.palette]
+            chunk.load_tile_ids([tile_ids[index] for index in palette_indices])
+        return chunk
     
-    def create_chunk(self, x:int, y:int):
-        return Chunk(None)
+    def create_chunk(self,
+                     x:int,
+                     y:int,
+                     tile_registry:TileRegistry,
+                     headless:bool=False) -> Chunk:
+        return self.build_chunk(self.generate(x, y), tile_registry, headless)
 
 class World(object):
-    chunks:t.Dict[str, Chunk]
+    chunks:t.Dict[t.Tuple[int, int], Chunk]
     chunk_generator:ChunkGenerator
     tile_registry: TileRegistry
-    particles:t.List[Particle]
+    particles:ParticleSystem
     entities:t.List[Entity]
+    entity_index:SpatialHash
+    pending_entities:t.List[Entity]
+    _defer_chunk_redraws:bool
+    _chunk_rebuild_budget:t.Union[float, None]
+    rebuild_queue:t.Dict[Chunk, None]
+    drawn_chunks:t.OrderedDict[t.Tuple[int, int], Chunk]
+    chunk_surface_release_delay:t.Union[float, None]
+    chunk_surface_budget:t.Union[int, None]
+    chunk_layer:t.Union[ChunkLayer, None]
+    headless:bool
+    stats:FrameStats
     _last_chunks_drawn_count:int
 
-    def __init__(self, tile_registry:TileRegistry):
+    def __init__(self,
+                 tile_registry:TileRegistry,
+                 headless:bool=False,
+                 stats:t.Union[FrameStats, None]=None):
         self.chunks = {}
         self.chunk_generator = ChunkGenerator()
         self.tile_registry = tile_registry
-        self.particles = []
+        self.particles = ParticleSystem(self)
         self.entities = []
+        # Broadphase index of the entities, refreshed as they update
+        self.entity_index = SpatialHash(256)
+        # Entities spawned since the last lifecycle phase
+        self.pending_entities = []
+        # When set, chunks only redraw their edited tiles
+        # right before they are next drawn
+        self._defer_chunk_redraws = False
+        # When set, chunk redraws are deferred and draw_chunks() spends
+        # at most this many milliseconds per frame on them, visible
+        # chunks first
+        self._chunk_rebuild_budget = None
+        # Deferred chunks waiting to be redrawn, oldest first. Only used
+        # with a chunk_rebuild_budget, since nothing else works through
+        # it. Without one, deferred chunks catch up when they're drawn.
+        self.rebuild_queue = {}
+        # Chunks that have a surface because they were drawn, from
+        # least to most recently drawn
+        self.drawn_chunks = collections.OrderedDict()
+        # When set, chunk surfaces are released once they've been off
+        # screen for this many seconds, or while they use more than this
+        # many bytes in total, and rebuilt from their tiles when next
+        # drawn. Both are off by default, since anything drawn onto a
+        # chunk surface directly is lost when it's released.
+        self.chunk_surface_release_delay = None
+        self.chunk_surface_budget = None
+        # When set, draw() draws chunks through this persistent layer,
+        # which only redraws what changed since the last frame
+        self.chunk_layer = None
+        # Headless worlds only keep tile and collision data, for
+        # dedicated servers and batch simulation. They never draw.
+        self.headless = headless
+        # Per-frame profiling stats, which are off unless enabled
+        self.stats = stats if stats is not None else FrameStats()
+        # The most recently looked up chunk, since lookups
+        # usually hit the same chunk many times in a row
+        self._last_chunk = None
+        self._last_chunk_x = 0
+        self._last_chunk_y = 0
     
-    def get_chunk_key(self, x:int, y:int) -> str:
-        return f"w{x},{y}"
+    @property
+    def defer_chunk_redraws(self) -> bool:
+        return self._defer_chunk_redraws
+
+    @defer_chunk_redraws.setter
+    def defer_chunk_redraws(self, value:bool):
+        self._defer_chunk_redraws = value
+        self._update_chunk_defer_redraw()
+
+    @property
+    def chunk_rebuild_budget(self) -> t.Union[float, None]:
+        return self._chunk_rebuild_budget
+
+    @chunk_rebuild_budget.setter
+    def chunk_rebuild_budget(self, value:t.Union[float, None]):
+        self._chunk_rebuild_budget = value
+        self._update_chunk_defer_redraw()
+
+    def _should_defer_redraws(self) -> bool:
+        return (self._defer_chunk_redraws
+                or self._chunk_rebuild_budget is not None)
+
+    def _get_chunk_rebuild_queue(self) -> t.Union[t.Dict[Chunk, None], None]:
+        return self.rebuild_queue if self._chunk_rebuild_budget is not None else None
+
+    def _update_chunk_defer_redraw(self):
+        # Apply the settings to the chunks already in the world. Chunks
+        # that stop deferring keep their pending edits, which are still
+        # caught up on before they're next drawn.
+        defer_redraw = self._should_defer_redraws()
+        rebuild_queue = self._get_chunk_rebuild_queue()
+        if rebuild_queue is None:
+            self.rebuild_queue.clear()
+        for chunk in self.chunks.values():
+            chunk.defer_redraw = defer_redraw
+            chunk.rebuild_queue = rebuild_queue
+            # Queue the chunks that were already waiting to be redrawn
+            if rebuild_queue is not None and chunk.dirty_tiles:
+                rebuild_queue[chunk] = None
+
+    def get_chunk_key(self, x:int, y:int) -> t.Tuple[int, int]:
+        return (x, y)
     
     def get_chunk(self, x:int, y:int, create_if_not_exists:bool=False):
-        key = self.get_chunk_key(x, y)
-        chunk = self.chunks.get(key)
-        if chunk is None and create_if_not_exists:
-            chunk = self.chunk_generator.create_chunk(x, y)
-            chunk.tile_registry = self.tile_registry
-            self.chunks[key] = chunk
+        if (self._last_chunk is not None
+                and x == self._last_chunk_x
+                and y == self._last_chunk_y):
+            return self._last_chunk
+        chunk = self.chunks.get((x, y))
+        if chunk is None:
+            if not create_if_not_exists:
+                return None
+            chunk = self.chunk_generator.create_chunk(
+                x, y, self.tile_registry, self.headless)
+            self.add_chunk(x, y, chunk)
+        self._last_chunk = chunk
+        self._last_chunk_x = x
+        self._last_chunk_y = y
+        return chunk
+
+    def add_chunk(self, x:int, y:int, chunk:Chunk):
+        """Adds a chunk to the world, replacing any chunk already
+        at that location.
+
+        Args:
+            x (int): X location of the chunk.
+            y (int): Y location of the chunk.
+            chunk (Chunk): The chunk to add.
+        """
+        chunk.tile_registry = self.tile_registry
+        chunk.defer_redraw = self._should_defer_redraws()
+        chunk.rebuild_queue = self._get_chunk_rebuild_queue()
+        chunk.stats = self.stats
+        replaced_chunk = self.chunks.get((x, y))
+        if replaced_chunk is not None:
+            self.rebuild_queue.pop(replaced_chunk, None)
+        self.chunks[(x, y)] = chunk
+        self.drawn_chunks.pop((x, y), None)
+        if x == self._last_chunk_x and y == self._last_chunk_y:
+            self._last_chunk = None
+
+    def remove_chunk(self, x:int, y:int) -> t.Union[Chunk, None]:
+        """Removes a chunk from the world.
+
+        Args:
+            x (int): X location of the chunk.
+            y (int): Y location of the chunk.
+
+        Returns:
+            Chunk | None: The removed chunk, if there was one.
+        """
+        if x == self._last_chunk_x and y == self._last_chunk_y:
+            self._last_chunk = None
+        self.drawn_chunks.pop((x, y), None)
+        chunk = self.chunks.pop((x, y), None)
+        if chunk is not None:
+            self.rebuild_queue.pop(chunk, None)
         return chunk
 
+    def iter_chunks_in_rect(self,
+                            rect:pygame.Rect,
+                            create_if_not_exists:bool=False)\
+            -> t.Iterator[t.Tuple[int, int, Chunk]]:
+        """Iterates over the chunks overlapping a rect in world space.
+
+        Args:
+            rect (pygame.Rect): The rect in world space.
+            create_if_not_exists (bool, optional): Whether to create
+            missing chunks instead of skipping them. Defaults to False.
+
+        Yields:
+            (x (int), y (int), chunk (Chunk)): The chunk location and chunk.
+        """
+        chunk_min_x = int(rect.left//256)
+        chunk_min_y = int(rect.top//256)
+        chunk_max_x = int(util.ceil_div(rect.right, 256))
+        chunk_max_y = int(util.ceil_div(rect.bottom, 256))
+        chunks = self.chunks
+        for y in range(chunk_min_y, chunk_max_y):
+            for x in range(chunk_min_x, chunk_max_x):
+                chunk = chunks.get((x, y))
+                if chunk is None:
+                    if not create_if_not_exists: continue
+                    chunk = self.get_chunk(x, y, True)
+                yield x, y, chunk
+
+    def set_tiles(self,
+                  tiles:t.Iterable[t.Tuple[int, int, t.Union[str, None]]],
+                  create_chunks:bool=True):
+        """Sets many tiles across chunk boundaries in one call.
+
+        Edits are grouped by chunk so that each touched chunk
+        redraws its cached surface only once.
+
+        Args:
+            tiles (Iterable[Tuple[int, int, str | None]]): (x, y, identifier)
+            entries in world tile coordinates. An identifier of None
+            clears the tile.
+            create_chunks (bool, optional): Whether to create chunks
+            that do not exist yet. Defaults to True.
+        """
+        get_tile_id = self.tile_registry.get_tile_id
+        chunk_edits:t.Dict[t.Tuple[int, int], t.List[t.Tuple[int, int, int]]] = {}
+        for x, y, identifier in tiles:
+            edits = chunk_edits.get((x//16, y//16))
+            if edits is None:
+                edits = chunk_edits[(x//16, y//16)] = []
+            edits.append((x%16, y%16, get_tile_id(identifier)))
+        for (chunk_x, chunk_y), edits in chunk_edits.items():
+            # Clearing never needs to create new chunks
+            create_chunk = create_chunks and any(tile_id != 0 for _, _, tile_id in edits)
+            chunk = self.get_chunk(chunk_x, chunk_y, create_chunk)
+            if chunk is None: continue
+            chunk.set_tile_ids(edits)
+
+    def fill_region(self,
+                    rect:pygame.Rect,
+                    identifier:t.Union[str, None]):
+        """Fills a rect of tiles with a single tile type.
+
+        Args:
+            rect (pygame.Rect): The region in world tile coordinates.
+            identifier (str | None): The tile identifier, or None
+            to clear the region.
+        """
+        tile_id = self.tile_registry.get_tile_id(identifier)
+        chunk_min = (rect.left//16, rect.top//16)
+        chunk_max = (util.ceil_div(rect.right, 16), util.ceil_div(rect.bottom, 16))
+        for chunk_y in range(chunk_min[1], chunk_max[1]):
+            for chunk_x in range(chunk_min[0], chunk_max[0]):
+                # Clearing never needs to create new chunks
+                chunk = self.get_chunk(chunk_x, chunk_y, tile_id != 0)
+                if chunk is None: continue
+                # Clip the region to this chunk, in chunk tile coordinates
+                x_min = max(rect.left-chunk_x*16, 0)
+                y_min = max(rect.top-chunk_y*16, 0)
+                x_max = min(rect.right-chunk_x*16, 16)
+                y_max = min(rect.bottom-chunk_y*16, 16)
+                chunk.set_tile_ids(
+                    (x, y, tile_id)
+                    for y in range(y_min, y_max)
+                    for x in range(x_min, x_max))
+
+    def clear_region(self, rect:pygame.Rect):
+        """Removes all tiles in a rect.
+
+        Args:
+            rect (pygame.Rect): The region in world tile coordinates.
+        """
+        self.fill_region(rect, None)
+
     def world_location_to_chunk_location(
             self, x:float, y:float) -> t.Tuple[int, int]:
         """Converts a given world location into a chunk location.
@@ -70,10 +377,19 @@ class World(object):
         Returns:
             bool: Whether the point collided.
         """
+        if self.stats.enabled:
+            self.stats.count("collide_point")
         chunk_x, chunk_y = self.world_location_to_chunk_location(point.x, point.y)
         chunk = self.get_chunk(chunk_x, chunk_y)
         if chunk is None:
             return False
+        # Answer empty and full tiles straight from the collision grid
+        collision_type = chunk.collision_types[
+            int(point.y%256//16)*16 + int(point.x%256//16)]
+        if collision_type == COLLISION_NONE:
+            return False
+        if collision_type == COLLISION_FULL:
+            return True
         # Convert the point to chunk-space and check
         # whether it collides in the chunk
         point_chunkspace = pygame.Vector2(
@@ -81,103 +397,423 @@ class World(object):
             point.y%256)
         return chunk.collide_point(point_chunkspace)
     
+    def collide_points(self, xs:np.ndarray, ys:np.ndarray) -> np.ndarray:
+        """Checks many points in the world against the tiles at once.
+
+        Points are grouped by chunk, and each group is resolved with a
+        single lookup into the chunk's collision grid. Only points that
+        land in tiles with custom collision shapes are tested one by one.
+
+        Args:
+            xs (np.ndarray): X locations of the points in world space.
+            ys (np.ndarray): Y locations of the points in world space.
+
+        Returns:
+            np.ndarray: Boolean array of whether each point collided.
+        """
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        if self.stats.enabled:
+            self.stats.count("collide_points")
+            self.stats.count("collide_points_points", len(xs))
+        result = np.zeros(len(xs), dtype=np.bool_)
+        if len(xs) == 0 or not self.chunks:
+            return result
+        tile_xs = np.floor_divide(xs, 16).astype(np.int64)
+        tile_ys = np.floor_divide(ys, 16).astype(np.int64)
+        tile_indices = (tile_ys & 15)*16 + (tile_xs & 15)
+        # Pack both chunk coordinates into one key to group points by chunk
+        chunk_keys = ((tile_xs >> 4) << 32) | ((tile_ys >> 4) & 0xFFFFFFFF)
+        unique_keys, inverse = np.unique(chunk_keys, return_inverse=True)
+        order = np.argsort(inverse, kind="stable")
+        groups = np.split(order, np.cumsum(np.bincount(inverse))[:-1])
+        for key, group in zip(unique_keys.tolist(), groups):
+            chunk_y = key & 0xFFFFFFFF
+            if chunk_y >= 1<<31:
+                chunk_y -= 1<<32
+            chunk = self.chunks.get((key >> 32, chunk_y))
+            if chunk is None:
+                continue
+            collision_types = np.frombuffer(chunk.collision_types, dtype=np.uint8)[tile_indices[group]]
+            result[group] = collision_types == COLLISION_FULL
+            # Fall back to point tests for custom collision shapes
+            for i in group[collision_types == COLLISION_CUSTOM].tolist():
+                result[i] = chunk.collide_point(pygame.Vector2(xs[i]%256, ys[i]%256))
+        return result
+    
     def collide_rect(self, rect:pygame.Rect) -> bool:
+        """Checks if a given rect in the world collides
+        with any tiles.
+
+        Full solid tiles are found with bit tests against each
+        chunk's solid_rows, and only tiles with custom collision
+        shapes are tested against their rects.
+
+        Args:
+            rect (pygame.Rect): The rect in world space.
+
+        Returns:
+            bool: Whether the rect collided.
+        """
+        if self.stats.enabled:
+            self.stats.count("collide_rect")
+        if rect.width <= 0 or rect.height <= 0:
+            return False
         tile_min = (
             rect.left//16,
             rect.top//16)
         tile_max = (
             util.ceil_div(rect.right, 16),
             util.ceil_div(rect.bottom, 16))
-        for y in range(tile_min[1], tile_max[1]):
-            for x in range(tile_min[0], tile_max[0]):
-                # Get the chunk at this tile location
-                chunk_x = x//16
-                chunk_y = y//16
-                chunk = self.get_chunk(chunk_x, chunk_y)
-                if chunk is None:
-                    continue
-                # Get the tile at this location
-                tile_space_x = x%16
-                tile_space_y = y%16
-                tile = chunk.get_tile(tile_space_x, tile_space_y)
-                if tile is None:
-                    continue
-                # Get the tile registry entry to find collisions
-                tile_registry_entry = self.tile_registry.get_tile_registry_entry(tile.identifier)
-                if tile_registry_entry is None:
-                    continue
-                # print(f"Test collision at {x}, {y}")
-                if tile_registry_entry.collide_rect(rect, pygame.Vector2(x*16, y*16)):
+        entries = self.tile_registry.entries
+        for chunk_x, chunk_y, chunk in self.iter_chunks_in_rect(rect):
+            # Clip the tile range to this chunk
+            chunk_tile_x = chunk_x*16
+            chunk_tile_y = chunk_y*16
+            x_min = max(tile_min[0], chunk_tile_x)-chunk_tile_x
+            x_max = min(tile_max[0], chunk_tile_x+16)-chunk_tile_x
+            y_min = max(tile_min[1], chunk_tile_y)-chunk_tile_y
+            y_max = min(tile_max[1], chunk_tile_y+16)-chunk_tile_y
+            # Mask of the overlapped columns within each row
+            row_mask = ((1<<(x_max-x_min))-1)<<x_min
+            solid_rows = chunk.solid_rows
+            custom_rows = chunk.custom_rows
+            for y in range(y_min, y_max):
+                if solid_rows[y] & row_mask:
                     return True
+                custom_bits = custom_rows[y] & row_mask
+                if not custom_bits:
+                    continue
+                # Fall back to rect tests for custom collision shapes
+                for x in range(x_min, x_max):
+                    if not custom_bits & (1<<x):
+                        continue
+                    tile_registry_entry = entries[chunk.tile_ids[y*16+x]]
+                    if tile_registry_entry.collide_rect(rect, pygame.Vector2(
+                            (chunk_tile_x+x)*16, (chunk_tile_y+y)*16)):
+                        return True
         return False
 
     def update(self, dt:float):
+        stats = self.stats
+        timer = stats.start()
         # Update particles
-        self.particles = [p for p in self.particles if p.update(dt)]
+        self.particles.update(dt)
+        timer = stats.lap("particle_update", timer)
+        entity_index = self.entity_index
         for entity in self.entities:
             entity.update(dt)
+            entity_index.update(entity)
+        timer = stats.lap("entity_update", timer)
+        self.update_lifecycle()
+        stats.lap("lifecycle", timer)
+        if stats.enabled:
+            stats.set("particles", len(self.particles))
+            stats.set("entities", len(self.entities))
+
+    def update_lifecycle(self):
+        """Removes dead and despawned entities, running their
+        on_death/on_despawn hooks, then adds the entities that were
+        spawned since the last call.
+
+        Survivors are compacted in a single pass, so removing
+        any number of entities costs one walk over the list.
+        """
+        entities = self.entities
+        entity_index = self.entity_index
+        if any(e.dead or e.despawn for e in entities):
+            survivors = []
+            for e in entities:
+                if e.dead:
+                    e.on_death()
+                    e.on_despawn()
+                    entity_index.remove(e)
+                elif e.despawn:
+                    e.on_despawn()
+                    entity_index.remove(e)
+                else:
+                    survivors.append(e)
+            entities[:] = survivors
+        # Hooks above may spawn entities too, so add pending entities last
+        if self.pending_entities:
+            pending_entities = self.pending_entities
+            self.pending_entities = []
+            for e in pending_entities:
+                entities.append(e)
+                entity_index.update(e)
+
+    def spawn_entity(self, entity:Entity):
+        """Queues an entity to be added to the world at the end of
+        the next update. Safe to call while entities are updating.
+
+        Args:
+            entity (Entity): The entity to spawn.
+        """
+        self.pending_entities.append(entity)
+
+    def remove_entity(self, entity:Entity):
+        """Flags an entity to be despawned at the end of the next
+        update. Safe to call while entities are updating.
+
+        Args:
+            entity (Entity): The entity to remove.
+        """
+        entity.despawn = True
     
+    def query_entities_in_rect(self, rect:pygame.Rect) -> t.List[Entity]:
+        """Finds the entities whose collider rects overlap a rect.
+
+        Args:
+            rect (pygame.Rect): The rect in world space.
+
+        Returns:
+            List[Entity]: The overlapping entities.
+        """
+        return self.entity_index.query_rect(rect)
+
+    def query_entities_in_radius(self,
+                                 position:pygame.Vector2,
+                                 radius:float) -> t.List[Entity]:
+        """Finds the entities whose collider rects overlap a circle.
+
+        Args:
+            position (pygame.Vector2): Center of the circle in world space.
+            radius (float): Radius of the circle.
+
+        Returns:
+            List[Entity]: The overlapping entities.
+        """
+        return self.entity_index.query_radius(position, radius)
+
+    def query_nearest_entity(self,
+                             position:pygame.Vector2,
+                             max_radius:float,
+                             entity_type:t.Union[type, None]=None,
+                             exclude:t.Union[Entity, None]=None)\
+            -> t.Union[Entity, None]:
+        """Finds the entity nearest to a position, optionally of a type.
+
+        Args:
+            position (pygame.Vector2): The position in world space.
+            max_radius (float): The furthest distance to search.
+            entity_type (type, optional): Only consider instances of
+            this type. Defaults to None.
+            exclude (Entity, optional): An entity to ignore. Defaults to None.
+
+        Returns:
+            Entity | None: The nearest entity, if any is in range.
+        """
+        return self.entity_index.query_nearest(
+            position, max_radius, entity_type, exclude)
+
     def spawn_particle(self, particle:Particle):
-        self.particles.append(particle)
+        self.particles.add(particle)
     
     def draw_chunks(self,
                     surface:pygame.Surface,
                     screen_bounds:pygame.Rect,
-                    camera_position:pygame.Vector2):
-        # Convert screen bounds to world coordinates
-        screen_bounds_min = screen_bounds.topleft
-        screen_bounds_max = screen_bounds.bottomright
-        world_bounds_min = (
-            screen_bounds_min[0]+camera_position.x,
-            screen_bounds_min[1]+camera_position.y )
-        world_bounds_max = (
-            screen_bounds_max[0]+camera_position.x,
-            screen_bounds_max[1]+camera_position.y )
-        # Find the min and max chunks we need to draw
-        chunk_min = self.world_location_to_chunk_location(*world_bounds_min)
-        chunk_max = self.world_location_to_chunk_location(*world_bounds_max)
+                    camera_position:pygame.Vector2,
+                    display_scale:float=1.0):
+        """Draws every chunk that overlaps the screen bounds.
+
+        Args:
+            surface (pygame.Surface): Surface to draw to.
+            screen_bounds (pygame.Rect): Area of the surface to draw to.
+            camera_position (pygame.Vector2): The camera position.
+            display_scale (float, optional): Pixels per world unit. Chunks
+            are drawn from surfaces cached at this scale, so the world
+            can be drawn straight to a full resolution display instead
+            of scaling up a small screen surface. Defaults to 1.0.
+        """
+        for x, y, chunk in self.iter_drawable_chunks(
+                screen_bounds, camera_position, display_scale):
+            surface.blit(
+                chunk.get_scaled_surface(display_scale),
+                self.get_chunk_screen_position(x, y, camera_position, display_scale))
+
+    def get_chunk_screen_position(self,
+                                  x:int,
+                                  y:int,
+                                  camera_position:pygame.Vector2,
+                                  display_scale:float=1.0) -> t.Tuple[int, int]:
+        # Floor pixel coordinates to fix odd offset rendering bug
+        return (int((x*256 - camera_position.x)*display_scale // 1),
+                int((y*256 - camera_position.y)*display_scale // 1))
+
+    def iter_drawable_chunks(self,
+                             screen_bounds:pygame.Rect,
+                             camera_position:pygame.Vector2,
+                             display_scale:float=1.0)\
+            -> t.Iterator[t.Tuple[int, int, Chunk]]:
+        """Iterates over the chunks to draw in the screen bounds, with
+        their surfaces up to date. Empty chunks, and chunks that ran out
+        of chunk_rebuild_budget before getting a surface, are skipped.
+
+        Once the iteration finishes, the rest of the rebuild budget is
+        spent on off-screen chunks, and unused chunk surfaces are released.
+
+        Args:
+            screen_bounds (pygame.Rect): Area of the surface being drawn to.
+            camera_position (pygame.Vector2): The camera position.
+            display_scale (float, optional): Pixels per world unit.
+            Defaults to 1.0.
+
+        Yields:
+            (x (int), y (int), chunk (Chunk)): The chunk location and chunk.
+        """
+        if self.headless:
+            return
+        # Convert screen bounds to world coordinates, padded by a
+        # pixel to cover fractional camera positions
+        world_bounds = pygame.Rect(
+            (screen_bounds.left/display_scale+camera_position.x)//1,
+            (screen_bounds.top/display_scale+camera_position.y)//1,
+            util.ceil_div(screen_bounds.width, display_scale)+1,
+            util.ceil_div(screen_bounds.height, display_scale)+1)
         # Initialize chunk draw counter
         chunk_draw_counter = 0
-        # Iterate over the chunk range to draw visible chunks
-        for y in range(chunk_min[1], chunk_max[1]+1):
-            for x in range(chunk_min[0], chunk_max[0]+1):
-                chunk = self.get_chunk(x, y, False)
-                if chunk is None: continue
-                # Floor pixel coordinates to fix odd offset rendering bug
-                pixel_x = (x*256 - camera_position.x) // 1
-                pixel_y = (y*256 - camera_position.y) // 1
-                surface.blit(chunk.surface, (pixel_x, pixel_y))
-                # Increment chunk draw counter
+        now = time.perf_counter()
+        drawn_chunks = self.drawn_chunks
+        rebuild_queue = self.rebuild_queue
+        # Past the deadline, visible chunks that need redrawing show their
+        # last surface and chunks without one are skipped, though at least
+        # one chunk is always rebuilt so that drawing catches up
+        deadline = None
+        if self.chunk_rebuild_budget is not None:
+            deadline = now+self.chunk_rebuild_budget/1000
+        chunks_rebuilt = 0
+        # Zoomed out chunks draw from mipmaps built from their tiles,
+        # so they never need their full size surface
+        use_mip_surfaces = display_scale <= 0.5
+        # Iterate over the chunks in the world bounds to find visible chunks
+        for x, y, chunk in self.iter_chunks_in_rect(world_bounds):
+            if use_mip_surfaces:
+                if not chunk.has_scaled_surface(display_scale):
+                    if chunk.is_empty():
+                        continue
+                    if (deadline is not None and chunks_rebuilt > 0
+                            and time.perf_counter() >= deadline):
+                        continue
+                    chunk.get_scaled_surface(display_scale)
+                    chunks_rebuilt += 1
+                chunk.last_drawn = now
+                drawn_chunks[(x, y)] = chunk
+                drawn_chunks.move_to_end((x, y))
+                yield x, y, chunk
                 chunk_draw_counter += 1
+                continue
+            has_surface = chunk.has_surface
+            # Empty chunks never need a surface
+            if not has_surface and chunk.is_empty():
+                continue
+            if not has_surface or chunk.dirty_tiles:
+                if (deadline is None or chunks_rebuilt == 0
+                        or time.perf_counter() < deadline):
+                    # Catch up on any tile edits that were deferred,
+                    # or create the surface
+                    if has_surface:
+                        chunk.redraw_dirty_tiles()
+                    else:
+                        chunk.reset_cached_surface()
+                        chunk.update_cached_surface()
+                    rebuild_queue.pop(chunk, None)
+                    chunks_rebuilt += 1
+                elif not has_surface:
+                    continue
+            chunk.last_drawn = now
+            drawn_chunks[(x, y)] = chunk
+            drawn_chunks.move_to_end((x, y))
+            yield x, y, chunk
+            # Increment chunk draw counter
+            chunk_draw_counter += 1
         # Update the last chunks drawn count
         self._last_chunks_drawn_count = chunk_draw_counter
+        # Spend what's left of the budget on off-screen chunks
+        if deadline is not None:
+            while rebuild_queue and time.perf_counter() < deadline:
+                chunk = next(iter(rebuild_queue))
+                del rebuild_queue[chunk]
+                if chunk.dirty_tiles:
+                    chunk.redraw_dirty_tiles()
+                    chunks_rebuilt += 1
+        self.release_chunk_surfaces(now)
+        if self.stats.enabled:
+            self.stats.count("chunks_drawn", chunk_draw_counter)
+            self.stats.count("chunks_rebuilt", chunks_rebuilt)
+            self.stats.set("chunk_surfaces", len(drawn_chunks))
+            self.stats.set("chunk_rebuild_queue", len(rebuild_queue))
+
+    def release_chunk_surfaces(self, now:t.Union[float, None]=None):
+        """Releases the surfaces of chunks that have been off screen for
+        longer than chunk_surface_release_delay, then the surfaces of the
+        least recently drawn chunks while over chunk_surface_budget.
+        Chunks drawn at `now` always keep their surfaces.
+
+        Args:
+            now (float, optional): The current time.perf_counter() time.
+            Defaults to None, for the current time.
+        """
+        if now is None:
+            now = time.perf_counter()
+        drawn_chunks = self.drawn_chunks
+        delay = self.chunk_surface_release_delay
+        budget = self.chunk_surface_budget
+        memory = 0
+        if budget is not None:
+            memory = sum(chunk.get_surface_memory() for chunk in drawn_chunks.values())
+        while drawn_chunks:
+            key, chunk = next(iter(drawn_chunks.items()))
+            if chunk.last_drawn >= now:
+                break
+            expired = delay is not None and now-chunk.last_drawn > delay
+            if not expired and (budget is None or memory <= budget):
+                break
+            memory -= chunk.get_surface_memory()
+            chunk.release_surface()
+            del drawn_chunks[key]
 
     def draw_entities(self,
                       surface:pygame.Surface,
-                      camera_position:pygame.Vector2):
-        remove_entities = []
+                      camera_position:pygame.Vector2,
+                      interpolation:float=1.0,
+                      display_scale:float=1.0):
+        # Only scaled drawing passes the display scale on, so entities
+        # overriding draw() without it keep working at scale 1
+        draw_args = () if display_scale == 1 else (display_scale,)
+        if interpolation == 1.0:
+            for e in self.entities:
+                e.draw(surface, camera_position, *draw_args)
+            return
+        # Shift the camera by each entity's interpolation offset, so
+        # entities draw at their interpolated position without needing
+        # to know about interpolation themselves
         for e in self.entities:
-            e.draw(surface, camera_position)
-            if e.dead:
-                e.on_death()
-                e.on_despawn()
-                remove_entities.append(e)
-            elif e.despawn:
-                e.on_despawn()
-                remove_entities.append(e)
-        for e in remove_entities:
-            self.entities.remove(e)
+            offset = e.get_interpolated_position(interpolation)-e.position
+            e.draw(surface, camera_position-offset, *draw_args)
 
     def draw_particles(self,
                        surface:pygame.Surface,
-                       camera_position:pygame.Vector2):
-        for p in self.particles:
-            p.draw(surface, camera_position)
+                       camera_position:pygame.Vector2,
+                       screen_bounds:t.Union[pygame.Rect, None]=None,
+                       display_scale:float=1.0):
+        self.particles.draw(surface, camera_position, screen_bounds, display_scale)
 
     def draw(self,
              surface:pygame.Surface,
              screen_bounds:pygame.Rect,
-             camera_position:pygame.Vector2):
-        self.draw_chunks(surface, screen_bounds, camera_position)
-        self.draw_entities(surface, camera_position)
-        self.draw_particles(surface, camera_position)
\ No newline at end of file
+             camera_position:pygame.Vector2,
+             interpolation:float=1.0,
+             display_scale:float=1.0):
+        if self.headless:
+            return
+        stats = self.stats
+        timer = stats.start()
+        if self.chunk_layer is not None:
+            self.chunk_layer.draw(surface, screen_bounds, camera_position, display_scale)
+        else:
+            self.draw_chunks(surface, screen_bounds, camera_position, display_scale)
+        timer = stats.lap("chunk_draw", timer)
+        self.draw_entities(surface, camera_position, interpolation, display_scale)
+        timer = stats.lap("entity_draw", timer)
+        self.draw_particles(surface, camera_position, screen_bounds, display_scale)
+        stats.lap("particle_draw", timer)
\ No newline at end of file
@@ -46,10 +46,7 @@ tile_test2 = engine.tile_registry.register_tile(
 )
 
 # Set tiles in the world
-chunk = world.get_chunk(0, 0, True)
-for x in range(10):
-    for y in range(10):
-        chunk.set_tile(x, y, eclipse.Tile("test"))
+world.fill_region(pygame.Rect(0, 0, 10, 10), "test")
 
 
 
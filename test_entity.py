@@ -13,7 +13,6 @@ display_scale = 2
 display_size = (1200, 700)
 screen_size = (display_size[0]//display_scale, display_size[1]//display_scale)
 display = pygame.display.set_mode(display_size)
-screen = pygame.Surface(screen_size)
 pygame.display.set_caption("Eclipse Game Engine - Entity Test")
 
 # Setup Eclipse engine world
@@ -39,10 +38,7 @@ tile_test = engine.tile_registry.register_tile(
 )
 
 # Set tiles in the world
-chunk = world.get_chunk(0, 0, True)
-for x in range(10):
-    for y in range(10):
-        chunk.set_tile(x, y, eclipse.Tile("test"))
+world.fill_region(pygame.Rect(0, 0, 10, 10), "test")
 
 # Create an entity
 e = eclipse.Entity(
@@ -106,7 +102,7 @@ while running:
             lifetime=random.uniform(12, 16),
             colour=(c, c, c),
             radius=random.randint(1, 4))
-        world.particles.append(particle)
+        world.spawn_particle(particle)
     
     # Place bricks
     if keys_pressed[K_b]:
@@ -120,13 +116,14 @@ while running:
             if tile is None:
                 chunk.set_tile(tile_x, tile_y, eclipse.Tile("test"))
 
-    # Render content to the display, then update the display
-    screen.fill((30, 30, 30))
+    # Render content straight to the display at display scale,
+    # then update the display
+    display.fill((30, 30, 30))
     world.draw(
-        surface=screen,
-        screen_bounds=pygame.Rect((0,0), screen_size),
-        camera_position=engine.camera.position.__floordiv__(1))
-    display.blit(pygame.transform.scale(screen, display_size), (0,0))
+        surface=display,
+        screen_bounds=pygame.Rect((0,0), display_size),
+        camera_position=engine.camera.position.__floordiv__(1),
+        display_scale=display_scale)
 
     # Rect at mouse for collision testing
     r = pygame.Rect((0,0), (50, 50))
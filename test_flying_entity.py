@@ -40,10 +40,7 @@ tile_test = engine.tile_registry.register_tile(
 )
 
 # Set tiles in the world
-chunk = world.get_chunk(0, 0, True)
-for x in range(10):
-    for y in range(10):
-        chunk.set_tile(x, y, eclipse.Tile("test"))
+world.fill_region(pygame.Rect(0, 0, 10, 10), "test")
 
 
 # Custom entity class called Drone
@@ -141,7 +138,7 @@ while running:
             lifetime=15.0,
             colour=(c, 255-c, random.randint(0, 255)),
             radius=2)
-        world.particles.append(particle)
+        world.spawn_particle(particle)
     
     # Place bricks
     if keys_pressed[K_b]:
@@ -40,10 +40,7 @@ tile_test = engine.tile_registry.register_tile(
 )
 
 # Set tiles in the world
-chunk = world.get_chunk(0, 0, True)
-for x in range(10):
-    for y in range(10):
-        chunk.set_tile(x, y, eclipse.Tile("test"))
+world.fill_region(pygame.Rect(0, 0, 10, 10), "test")
 
 class SimpleAiEntity(eclipse.Entity):
     target: eclipse.Entity
@@ -162,7 +159,7 @@ while running:
             lifetime=random.uniform(12, 16),
             colour=(c, c, c),
             radius=random.randint(1, 4))
-        world.particles.append(particle)
+        world.spawn_particle(particle)
     
     # Place bricks
     if keys_pressed[K_b]:
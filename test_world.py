@@ -11,12 +11,15 @@ display_scale = 2
 display_size = (1200, 700)
 screen_size = (display_size[0]//display_scale, display_size[1]//display_scale)
 display = pygame.display.set_mode(display_size)
-screen = pygame.Surface(screen_size)
 pygame.display.set_caption("Eclipse Game Engine - World Test")
 
 # Setup Eclipse engine world
 engine = eclipse.Engine()
 world = engine.create_new_world("world")
+# Reuse the last frame's chunks while scrolling, over a grey background
+world.chunk_layer = eclipse.ChunkLayer(world, background=(30, 30, 30))
+# Overview of the world around the camera
+minimap = eclipse.Minimap(world, (200, 120), background=(30, 30, 30))
 
 # Center the camera position
 engine.camera.target.x -= screen_size[0]/2 - 16*5
@@ -36,10 +39,7 @@ tile_test = engine.tile_registry.register_tile(
 )
 
 # Set tiles in the world
-chunk = world.get_chunk(0, 0, True)
-for x in range(10):
-    for y in range(10):
-        chunk.set_tile(x, y, eclipse.Tile("test"))
+world.fill_region(pygame.Rect(0, 0, 10, 10), "test")
 
 # Initialize a clock for keeping stable FPS
 # and reading deltatime
@@ -83,7 +83,7 @@ while running:
             lifetime=15.0,
             colour=(c, 255-c, random.randint(0, 255)),
             radius=2)
-        world.particles.append(particle)
+        world.spawn_particle(particle)
     
     # Place bricks
     if keys_pressed[K_b]:
@@ -97,13 +97,14 @@ while running:
             if tile is None:
                 chunk.set_tile(tile_x, tile_y, eclipse.Tile("test"))
 
-    # Render content to the display, then update the display
-    screen.fill((30, 30, 30))
+    # Render content straight to the display at display scale,
+    # then update the display
     world.draw(
-        surface=screen,
-        screen_bounds=pygame.Rect((0,0), screen_size),
-        camera_position=engine.camera.position.__floordiv__(1))
-    display.blit(pygame.transform.scale(screen, display_size), (0,0))
+        surface=display,
+        screen_bounds=pygame.Rect((0,0), display_size),
+        camera_position=engine.camera.position.__floordiv__(1),
+        display_scale=display_scale)
+    minimap.draw(display, (display_size[0]-208, 8), engine.camera.position, screen_size)
 
     # Rect at mouse for collision testing
     r = pygame.Rect((0,0), (50, 50))